@@ -23,11 +23,1469 @@
 #  - Mathieu https://mathete.net/la-fractale-de-mandelbrot/
 #
 
-import pygame, sys, argparse, math
+import pygame, sys, os, argparse, math, json, hashlib, threading, queue, time, itertools, struct, zlib, re, cProfile, socket, stat
+from collections import OrderedDict
+from decimal import Decimal, localcontext, getcontext
 import matplotlib as mpl
+import numpy as np
+from multiprocessing import Pool, RawValue, shared_memory, resource_tracker
+
+# nombre de pixels calculés ensemble par le moteur vectoriel (blocs de lignes), pour limiter la mémoire utilisée
+BLOCK_PIXELS = 1 << 16
+
+# tolérance de la détection de périodicité: une orbite qui revient à moins de PERIOD_TOL d'un point déjà visité
+# est considérée comme périodique, donc bornée (nmax serait atteint)
+PERIOD_TOL = 1e-10
+
+# test analytique d'appartenance à la cardioïde principale ou au disque de période 2 de Mandelbrot (POWER == 2)
+# fonctionne pour des nombres comme pour des tableaux numpy
+def in_main_bulbs(cx, cy):
+    q = (cx - 0.25)**2 + cy**2
+    return (q*(q + (cx - 0.25)) <= 0.25*cy**2) | ((cx + 1)**2 + cy**2 <= 0.0625)
+
+# ajoute les valeurs aux mesures de stats (s'il y en a): les nombres sont additionnés, les listes prolongées
+def add_stats(stats, **values):
+    if stats is None:
+        return
+    for key, value in values.items():
+        if isinstance(value, list):
+            stats.setdefault(key, []).extend(value)
+        else:
+            stats[key] = stats.get(key, 0) + value
+
+# mesures d'un groupe de pixels calculé ensemble (une tuile): temps du calcul des coordonnées (de start à mapped) et des
+# itérations (de mapped à maintenant), et coût de la tuile en itérations (depuis before, le total des itérations avant)
+def add_tile_stats(stats, start, mapped, before):
+    if stats is not None:
+        add_stats(stats, mapping=mapped - start, iteration=time.perf_counter() - mapped,
+                  tile_costs=[stats.get("iterations", 0) - before])
+
+# noyaux d'itération: un pas de la suite z(n+1) = z(n)**power + c sur les tableaux complexes z et c des pixels actifs
+# puissances 2, 3 et 4 développées en multiplications: numpy n'appelle pas la puissance complexe générale (log et exp)
+def kernel_power2(z, c, power):
+    return z*z + c
+
+def kernel_power3(z, c, power):
+    return z*z*z + c
+
+def kernel_power4(z, c, power):
+    z2 = z*z
+    return z2*z2 + c
+
+# puissance entière quelconque (>= 1) par carrés successifs (exponentiation binaire)
+def kernel_squaring(z, c, power):
+    zp = None
+    while True:
+        if power & 1:
+            zp = z if zp is None else zp*z
+        power >>= 1
+        if not power:
+            return zp + c
+        z = z*z
+
+# puissance quelconque (même non entière) avec la puissance complexe de numpy
+def kernel_generic(z, c, power):
+    return z**power + c
+
+KERNELS = {"power2": kernel_power2, "power3": kernel_power3, "power4": kernel_power4, "squaring": kernel_squaring,
+           "generic": kernel_generic}
+
+# noyau de KERNELS pour la puissance power, avec la puissance à lui passer: "auto" choisit le plus rapide, et un noyau
+# qui ne sait pas calculer cette puissance (une autre puissance développée, squaring pour une puissance non entière)
+# est remplacé par ce choix
+def select_kernel(name, power):
+    integer = power == int(power) and power >= 1
+    if name not in KERNELS or name.startswith("power") and power != int(name[5:]) or name == "squaring" and not integer:
+        name = "power{}".format(int(power)) if power in (2, 3, 4) else "squaring" if integer else "generic"
+    return KERNELS[name], int(power) if integer else power
+
+# itérations vectorisées de la suite z(n+1) = z(n)**power + c sur des tableaux numpy de pixels
+# retourne le nombre d'itérations pour chaque pixel, ou -1 si nmax est atteint
+# avec interior, les orbites périodiques sont détectées (méthode de Brent: comparaison avec le point zref mémorisé à
+# chaque puissance de 2 d'itérations) et arrêtées tout de suite avec -1
+# pour reprendre des orbites déjà itérées start fois, z et zref sont leur état après ces start itérations
+# avec orbit, retourne aussi l'état (z, zref) des orbites arrêtées par nmax (NaN pour les autres), pour les reprendre
+# avec final, retourne aussi |z| au moment de la divergence (NaN pour les autres), pour la coloration continue
+# le pas est celui du noyau kernel (voir select_kernel); avec float32, les calculs sont faits en complex64 (deux fois
+# plus rapides, mais assez précis seulement pour des pixels plus grands qu'environ 1e-6)
+# le nombre d'itérations faites (pour tous les pixels) est ajouté à stats["iterations"]
+def iterate_array(z, c, nmax, amax, power, interior=False, start=0, zref=None, orbit=False, stats=None, kernel="auto",
+                  float32=False, final=False):
+    step, power = select_kernel(kernel, power)
+    dtype = np.complex64 if float32 else complex
+    z, c = np.broadcast_arrays(np.asarray(z, dtype=complex), np.asarray(c, dtype=complex))
+    z, c = z.ravel(), c.ravel()
+    n = np.full(z.shape, -1, dtype=np.int32)
+    zabs = np.full(z.shape, np.nan) if final else None
+    if start == 0:
+        escaped = abs(z) >= amax
+        n[escaped] = 0 # déjà divergé avant la 1ère itération
+        if final:
+            zabs[escaped] = abs(z[escaped])
+    idx = np.nonzero(n < 0)[0] # indices des pixels encore actifs
+    zi, ci = z[idx].astype(dtype), c[idx].astype(dtype)
+    zref = zi.copy() if zref is None else np.asarray(zref, dtype=complex).ravel()[idx].astype(dtype)
+    iterations = 0
+    for i in range(start + 1, nmax):
+        if idx.size == 0:
+            break
+        iterations += idx.size
+        zi = step(zi, ci, power)
+        mag = abs(zi) # plus rapide en numpy (hypot vectorisé) que le carré du module
+        active = mag < amax
+        if not active.all(): # retirer les pixels qui ont divergé à l'itération i
+            n[idx[~active]] = i
+            if final:
+                zabs[idx[~active]] = mag[~active]
+        if interior:
+            d = zi - zref
+            active &= d.real*d.real + d.imag*d.imag >= PERIOD_TOL*PERIOD_TOL # retirer les orbites périodiques (n reste -1)
+        if not active.all():
+            idx, zi, ci, zref = idx[active], zi[active], ci[active], zref[active]
+        if interior and i & (i - 1) == 0:
+            zref = zi.copy()
+    # les pixels encore actifs après nmax-1 itérations atteignent nmax (divergence ou pas à la dernière): -1
+    add_stats(stats, iterations=iterations)
+    result = (n,)
+    if orbit:
+        z_end, zref_end = np.full(z.shape, np.nan, dtype=complex), np.full(z.shape, np.nan, dtype=complex)
+        z_end[idx], zref_end[idx] = zi, zref
+        result += (z_end, zref_end)
+    if final:
+        result += (zabs,)
+    return result if len(result) > 1 else n
+
+# nombres d'itérations continus (coloration sans bandes) à partir des nombres d'itérations n et de |z| à la divergence
+# (voir iterate_array avec final): n + 1 - log(log|z| / log amax) / log power, entre n et n+1; -1 si nmax est atteint
+def smooth_counts(n, zabs, amax, power):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        nu = n + 1 - np.log(np.log(zabs) / math.log(amax)) / math.log(power) if power > 1 and amax > 1 else n.astype(float)
+    return np.where(n >= 0, np.clip(np.where(np.isnan(nu), n, nu), n, n + 1), -1).astype(np.float32)
+
+# paramètres d'un rendu: un dictionnaire au format des commandes json (Dtyp, xmin, xmax, ...),
+# complété par les paramètres de l'itération et la taille de l'image en pixels
+# interior active les raccourcis pour l'intérieur de l'ensemble (cardioïde et disque, détection de périodicité)
+# deep active le rendu par perturbation pour les zooms au delà de la précision des float (voir render_perturbation),
+# series l'approximation par série qui y saute les premières itérations; les bornes et c peuvent être des Decimal
+# kernel est le noyau d'itération (voir select_kernel), float32 le calcul en simple précision
+def make_params(Dtyp, xmin, xmax, ymin, ymax, nmax, cx=0, cy=0, power=2, amax=2, largeur=700, hauteur=700, interior=False,
+                deep=True, series=True, kernel="auto", float32=False):
+    return {"Dtyp": Dtyp, "xmin": xmin, "xmax": xmax, "ymin": ymin, "ymax": ymax, "nmax": nmax, "cx": cx, "cy": cy,
+            "power": power, "amax": amax, "largeur": largeur, "hauteur": hauteur, "interior": interior,
+            "deep": deep, "series": series, "kernel": kernel, "float32": float32}
+
+# options de iterate_array pour le noyau d'itération de params
+def kernel_options(params):
+    return {"kernel": params.get("kernel", "auto"), "float32": params.get("float32", False)}
+
+# valeur initiale z0 et constante c de la suite pour les pixels d'indices XSCR, YSCR de l'image décrite par params
+# ainsi que le masque des points dont on sait sans itérer qu'ils atteignent nmax (cardioïde et disque de Mandelbrot)
+def pixel_points(params, XSCR, YSCR):
+    xmin, xmax, ymin, ymax = (float(params[k]) for k in ("xmin", "xmax", "ymin", "ymax"))
+    # même conversion que getPosFromScr, appliquée à tous les pixels
+    x = XSCR * (xmax - xmin) / params["largeur"] + xmin
+    y = YSCR * (ymin - ymax) / params["hauteur"] + ymax
+    if params["Dtyp"] == "PlotMandel":
+        z, c = np.zeros(x.shape, dtype=complex), x + 1j*y # Mandelbrot: z0 = 0, c = le point du pixel
+        if params.get("interior", False) and params["power"] == 2 and params["amax"] >= 2:
+            return z, c, in_main_bulbs(x, y)
+    else:
+        z, c = x + 1j*y, np.full(x.shape, complex(float(params["cx"]), float(params["cy"]))) # Julia: z0 = le point du pixel, c constante
+    return z, c, np.zeros(x.shape, dtype=bool)
+
+# nombre d'itérations pour les pixels d'indices XSCR, YSCR (tableaux de même forme) de l'image décrite par params,
+# et état (z, zref) des orbites arrêtées par nmax (NaN pour les autres pixels), pour les continuer avec deepen
+# les mesures du calcul sont ajoutées à stats (voir add_tile_stats)
+def compute_state(params, XSCR, YSCR, stats=None):
+    start, before = time.perf_counter(), stats.get("iterations", 0) if stats is not None else 0
+    XSCR, YSCR = np.broadcast_arrays(XSCR, YSCR)
+    z, c, inside = pixel_points(params, XSCR, YSCR)
+    mapped = time.perf_counter()
+    # les points de la cardioïde principale et du disque de période 2 ne sont pas itérés
+    n = np.full(XSCR.shape, -1, dtype=np.int32)
+    state = np.full(XSCR.shape + (2,), np.nan, dtype=complex)
+    todo = ~inside
+    n[todo], state[todo, 0], state[todo, 1] = iterate_array(z[todo], c[todo], params["nmax"], params["amax"], params["power"],
+                                                            params.get("interior", False), orbit=True, stats=stats,
+                                                            **kernel_options(params))
+    add_tile_stats(stats, start, mapped, before)
+    return n, state
+
+# nombre d'itérations pour les pixels d'indices XSCR, YSCR (tableaux de même forme) de l'image décrite par params
+# si un tableau orbit[YSCR, XSCR, 2] est donné, l'état des orbites arrêtées par nmax y est écrit
+# les mesures du calcul sont ajoutées à stats (voir add_tile_stats)
+def compute_pixels(params, XSCR, YSCR, orbit=None, stats=None):
+    XSCR, YSCR = np.broadcast_arrays(XSCR, YSCR)
+    if orbit is not None:
+        n, orbit[YSCR, XSCR] = compute_state(params, XSCR, YSCR, stats)
+        return n
+    start, before = time.perf_counter(), stats.get("iterations", 0) if stats is not None else 0
+    z, c, inside = pixel_points(params, XSCR, YSCR)
+    mapped = time.perf_counter()
+    n = np.full(XSCR.shape, -1, dtype=np.int32)
+    n[~inside] = iterate_array(z[~inside], c[~inside], params["nmax"], params["amax"], params["power"], params.get("interior", False),
+                               stats=stats, **kernel_options(params))
+    add_tile_stats(stats, start, mapped, before)
+    return n
+
+# nouveau buffer pour la profondeur params["nmax"], à partir du buffer d'un rendu de la même vue à la profondeur
+# nmax_old, sans refaire les itérations déjà faites: pour une profondeur plus faible, les nombres d'itérations
+# déjà connus suffisent; pour une plus grande, seules les orbites arrêtées par nmax_old sont continuées, à partir de
+# leur état orbit (s'il n'est pas connu, les pixels à -1 sont itérés depuis z0)
+# retourne le buffer et l'état des orbites à la nouvelle profondeur (ou l'état donné si la profondeur diminue)
+# les mesures du calcul sont ajoutées à stats (voir add_tile_stats)
+def deepen(params, buffer, orbit, nmax_old, stats=None):
+    nmax = params["nmax"]
+    if nmax <= nmax_old:
+        return np.where(buffer >= nmax, -1, buffer).astype(np.int32), orbit
+    start, before = time.perf_counter(), stats.get("iterations", 0) if stats is not None else 0
+    buffer = buffer.copy()
+    if orbit is None:
+        YSCR, XSCR = np.nonzero(buffer < 0)
+        z, c, inside = pixel_points(params, XSCR, YSCR)
+        YSCR, XSCR, z, start, zref = YSCR[~inside], XSCR[~inside], z[~inside], 0, None
+    else:
+        YSCR, XSCR = np.nonzero(~np.isnan(orbit[:, :, 0]))
+        z, zref, start = orbit[YSCR, XSCR, 0], orbit[YSCR, XSCR, 1], nmax_old - 1
+    c = pixel_points(params, XSCR, YSCR)[1]
+    orbit = np.full(buffer.shape + (2,), np.nan, dtype=complex)
+    mapped = time.perf_counter()
+    buffer[YSCR, XSCR], orbit[YSCR, XSCR, 0], orbit[YSCR, XSCR, 1] = iterate_array(
+        z, c, nmax, params["amax"], params["power"], params.get("interior", False), start, zref, orbit=True, stats=stats,
+        **kernel_options(params))
+    add_tile_stats(stats, start, mapped, before)
+    return buffer, orbit
+
+# paramètres identiques, sauf peut-être nmax
+def same_view(a, b):
+    return a is not None and b is not None and dict(a, nmax=0) == dict(b, nmax=0)
+
+# taille relative des pixels en dessous de laquelle les float ne suffisent plus et le rendu par perturbation est utilisé
+DEEP_LIMIT = 1e-12
+# troncature de l'approximation par série: le terme de degré 3 doit rester négligeable devant celui de degré 2
+SERIES_TOL = 1e-3
+# erreur relative maximale de la série sur l'écart delta des pixels sondes: près du bord de l'ensemble, une erreur
+# bien plus petite qu'un pixel suffit à changer le nombre d'itérations après quelques milliers d'itérations, il faut
+# donc que la série soit aussi précise que les itérations en double précision
+SERIES_PROBE_TOL = 1e-14
+
+# nombre en Decimal, sans perdre les chiffres d'un string haute précision ni ajouter ceux de l'écriture binaire d'un float
+def to_decimal(v):
+    if isinstance(v, Decimal):
+        return v
+    return Decimal(v) if isinstance(v, str) else Decimal(repr(v))
+
+# nombre lu dans une commande json: les strings sont des coordonnées haute précision
+def to_number(v):
+    return Decimal(v) if isinstance(v, str) else v
+
+# nombre écrit dans une commande json: entre guillemets pour un Decimal, pour garder tous ses chiffres
+def json_number(v):
+    return '"{}"'.format(v) if isinstance(v, Decimal) else str(v)
+
+# la vue de params est-elle trop petite pour les float (pixels plus petits que DEEP_LIMIT relativement aux coordonnées)?
+def is_deep(params):
+    if not params.get("deep", False):
+        return False
+    with localcontext() as ctx:
+        ctx.prec = 30
+        xmin, xmax, ymin, ymax = (to_decimal(params[k]) for k in ("xmin", "xmax", "ymin", "ymax"))
+        pixel = min((xmax - xmin) / params["largeur"], (ymax - ymin) / params["hauteur"])
+        return pixel < Decimal(DEEP_LIMIT) * max(1, abs(xmin), abs(xmax), abs(ymin), abs(ymax))
+
+# orbite de référence z(n+1) = z(n)**power + c calculée en Decimal (z0 et c sont des couples de Decimal), arrondie en
+# complex à chaque itération; s'arrête quand abs(z) >= amax ou à nmax
+def reference_orbit(z0, c, nmax, amax, power):
+    zr, zi = z0
+    cr, ci = c
+    orbit = [complex(float(zr), float(zi))]
+    for n in range(1, nmax):
+        pr, pi = zr, zi
+        for _ in range(power - 1):
+            pr, pi = pr*zr - pi*zi, pr*zi + pi*zr
+        zr, zi = pr + cr, pi + ci
+        orbit.append(complex(float(zr), float(zi)))
+        if abs(orbit[-1]) >= amax:
+            break
+    return np.array(orbit)
+
+# différence (Z + delta)**power - Z**power, développée pour rester précise quand delta est très petit devant Z
+def perturb(Z, delta, power):
+    if power == 2:
+        return (2*Z + delta)*delta
+    result = np.zeros_like(delta)
+    for k in range(power, 0, -1): # Horner: somme des binôme(power, k) Z**(power-k) delta**k
+        result = (result + math.comb(power, k)*Z**(power - k))*delta
+    return result
+
+# rendu par perturbation pour les zooms profonds: une seule orbite de référence est calculée en haute précision
+# (Decimal) au centre de la vue (voir perturbation_reference), puis chaque pixel est itéré en double précision comme
+# un petit écart delta à cette orbite: delta(n+1) = (Z(n) + delta(n))**power - Z(n)**power + dc
+# quand le point z = Z + delta devient plus proche du début de l'orbite de référence que de Z (ce qui provoquerait les
+# "glitchs" de la perturbation), ou quand l'orbite de référence s'arrête, le pixel est rebasé: delta = z - Z(0) et il
+# repart du début de la référence. Pour Mandelbrot en POWER 2, l'approximation par série (params["series"]) calcule
+# directement delta après les premières itérations: delta = A dc + B dc**2 + C dc**3, tant que le terme
+# en C reste négligeable et que la série donne les mêmes delta que les itérations sur des pixels sondes
+# avec params["interior"], les orbites périodiques sont arrêtées avec -1, comme dans iterate_array
+# retourne le buffer; stats reçoit le nombre de rebasages et d'itérations sautées, et les mesures du calcul (le calcul
+# de l'orbite de référence compte comme celui des coordonnées)
+def render_perturbation(params, stats=None):
+    reference = perturbation_reference(params, stats)
+    YSCR, XSCR = np.mgrid[0:params["hauteur"], 0:params["largeur"]]
+    return perturbation_pixels(params, reference, XSCR, YSCR, stats)
+
+# référence d'un rendu par perturbation, commune à tous ses pixels: orbite de référence au centre de la vue, taille des
+# pixels et coefficients (A, B, C) de la série pour chaque nombre d'itérations sautées jusqu'au dernier valable
+# (start); le temps du calcul est ajouté à stats["mapping"]
+def perturbation_reference(params, stats=None):
+    begin = time.perf_counter()
+    largeur, hauteur, nmax, amax, power = params["largeur"], params["hauteur"], params["nmax"], params["amax"], params["power"]
+    mandel = ( params["Dtyp"] == "PlotMandel" )
+    xmin, xmax, ymin, ymax = (to_decimal(params[k]) for k in ("xmin", "xmax", "ymin", "ymax"))
+    with localcontext() as ctx:
+        ctx.prec = 30
+        pixel = float(min((xmax - xmin) / largeur, (ymax - ymin) / hauteur) / max(1, abs(xmin), abs(ymin)))
+        ctx.prec = max(30, 15 - int(math.log10(pixel))) # assez de chiffres pour distinguer les pixels
+        dx, dy = float((xmax - xmin) / largeur), float((ymax - ymin) / hauteur)
+        center = ((xmin + xmax) / 2, (ymin + ymax) / 2)
+        if mandel:
+            Zref = reference_orbit((Decimal(0), Decimal(0)), center, nmax, amax, power)
+        else:
+            Zref = reference_orbit(center, (to_decimal(params["cx"]), to_decimal(params["cy"])), nmax, amax, power)
+    A, B, C, start = 0j, 0j, 0j, 0
+    if mandel and power == 2 and params.get("series", False):
+        r = math.hypot(largeur*dx, hauteur*dy) / 2 # écart maximal d'un pixel au centre
+        coefficients = [(A, B, C)]
+        for k in range(min(len(Zref), nmax) - 2):
+            Z = Zref[k]
+            A, B, C = 2*Z*A + 1, 2*Z*B + A*A, 2*Z*C + 2*A*B
+            if abs(C)*r > SERIES_TOL*abs(B): # troncature: le terme de degré 3 n'est plus négligeable
+                break
+            coefficients.append((A, B, C))
+        # sondes aux coins et aux milieux des bords de la vue (où le terme de degré 3 est le plus grand), itérées par
+        # perturbation sans série: la série n'est gardée que jusqu'à la dernière itération où elle donne le delta de
+        # toutes les sondes à SERIES_PROBE_TOL près, et où aucune sonde n'a encore besoin d'être rebasée
+        dc = np.array([(x*largeur*dx + 1j*y*hauteur*dy) / 2 for x in (-1, 0, 1) for y in (-1, 0, 1) if x or y])
+        delta = np.zeros_like(dc)
+        for k in range(1, len(coefficients)):
+            delta = (2*Zref[k - 1] + delta)*delta + dc
+            A, B, C = coefficients[k]
+            if (abs((A + (B + C*dc)*dc)*dc - delta) > SERIES_PROBE_TOL*abs(delta)).any() or (abs(Zref[k] + delta - Zref[0]) < abs(delta)).any():
+                break
+            start = k
+        A, B, C = coefficients[start]
+    add_stats(stats, mapping=time.perf_counter() - begin)
+    return {"Zref": Zref, "dx": dx, "dy": dy, "series": (A, B, C, start)}
+
+# nombres d'itérations par perturbation (voir render_perturbation) des pixels d'indices XSCR, YSCR (tableaux de même
+# forme) de l'image décrite par params, avec la référence de perturbation_reference
+# les mesures du calcul sont ajoutées à stats (voir add_tile_stats)
+def perturbation_pixels(params, reference, XSCR, YSCR, stats=None):
+    begin, before = time.perf_counter(), stats.get("iterations", 0) if stats is not None else 0
+    largeur, hauteur, nmax, amax, power = params["largeur"], params["hauteur"], params["nmax"], params["amax"], params["power"]
+    Zref, dx, dy = reference["Zref"], reference["dx"], reference["dy"]
+    A, B, C, start = reference["series"]
+    XSCR, YSCR = np.broadcast_arrays(XSCR, YSCR)
+    # écart de chaque pixel au centre, en double précision
+    d = ((XSCR - largeur / 2)*dx + 1j*(hauteur / 2 - YSCR)*dy).ravel()
+    if params["Dtyp"] == "PlotMandel":
+        delta, dc = np.zeros_like(d), d
+    else:
+        delta, dc = d, np.zeros_like(d)
+    n = np.full(d.shape, -1, dtype=np.int32)
+    m = np.zeros(d.shape, dtype=np.intp) # indice de chaque pixel dans l'orbite de référence
+    if start > 0:
+        delta = (A + (B + C*dc)*dc)*dc
+        m[:] = start
+        if (abs(Zref[start] + delta) >= amax).any(): # des pixels ont divergé pendant les itérations sautées
+            delta, m[:], start = np.zeros_like(d), 0, 0
+    interior = params.get("interior", False)
+    tol = min(PERIOD_TOL, dx, dy) # pas plus que la taille des pixels: les orbites voisines restent distinguées
+    rebases, iterations = 0, 0
+    idx = np.nonzero(n < 0)[0]
+    delta, dc, m = delta[idx], dc[idx], m[idx]
+    zref = Zref[m] + delta # point mémorisé pour la détection de périodicité
+    last = len(Zref) - 1
+    mapped = time.perf_counter()
+    for i in range(start + 1, nmax):
+        if idx.size == 0:
+            break
+        iterations += idx.size
+        delta = perturb(Zref[m], delta, power) + dc
+        m += 1
+        z = Zref[m] + delta
+        active = z.real*z.real + z.imag*z.imag < amax*amax
+        if not active.all(): # retirer les pixels qui ont divergé à l'itération i
+            n[idx[~active]] = i
+        if interior:
+            w = z - zref
+            active &= w.real*w.real + w.imag*w.imag >= tol*tol # retirer les orbites périodiques (n reste -1)
+        if not active.all():
+            idx, delta, dc, m, z, zref = idx[active], delta[active], dc[active], m[active], z[active], zref[active]
+        if i == nmax - 1: # dernière itération, les pixels restants ont atteint nmax
+            break
+        if interior and i & (i - 1) == 0:
+            zref = z.copy()
+        # rebasage vers le début de l'orbite de référence
+        w = z - Zref[0]
+        rebase = (w.real*w.real + w.imag*w.imag < delta.real*delta.real + delta.imag*delta.imag) | (m == last)
+        if rebase.any():
+            delta[rebase], m[rebase] = w[rebase], 0
+            rebases += int(rebase.sum())
+    if stats is not None:
+        stats["rebases"] = stats.get("rebases", 0) + rebases
+        stats["series_skip"] = start
+        add_stats(stats, iterations=iterations)
+        add_tile_stats(stats, begin, mapped, before)
+    return n.reshape(XSCR.shape)
+
+# nombres d'itérations des ensembles de Julia de la vue de params pour chacune des constantes cs (tableau de complexes):
+# les pixels de toutes les images sont itérés ensemble par le moteur numpy, par groupes d'environ 4*BLOCK_PIXELS pixels
+# retourne un tableau (len(cs), hauteur, largeur)
+def julia_sweep(params, cs):
+    largeur, hauteur = params["largeur"], params["hauteur"]
+    YSCR, XSCR = np.mgrid[0:hauteur, 0:largeur]
+    z = pixel_points(dict(params, Dtyp="PlotJulia"), XSCR, YSCR)[0].ravel()
+    cs = np.asarray(cs, dtype=complex).ravel()
+    stack = np.empty((len(cs), z.size), dtype=np.int32)
+    per = max(1, 4*BLOCK_PIXELS // z.size) # nombre d'images itérées ensemble
+    for k in range(0, len(cs), per):
+        c = cs[k:k + per]
+        stack[k:k + len(c)] = iterate_array(z[None, :], c[:, None], params["nmax"], params["amax"], params["power"],
+                                            params.get("interior", False), **kernel_options(params)).reshape(len(c), -1)
+    return stack.reshape(len(cs), hauteur, largeur)
+
+# nombres d'itérations continus (voir smooth_counts) pour toute l'image décrite par params, en float32, calculés par
+# blocs de lignes avec |z| à la divergence donné par la même passe d'itérations
+def compute_smooth(params):
+    largeur, hauteur = params["largeur"], params["hauteur"]
+    buffer = np.empty((hauteur, largeur), dtype=np.float32)
+    rows = max(1, BLOCK_PIXELS // largeur)
+    for y0 in range(0, hauteur, rows):
+        YSCR, XSCR = np.mgrid[y0:min(y0 + rows, hauteur), 0:largeur]
+        z, c, inside = pixel_points(params, XSCR, YSCR)
+        n, zabs = np.full(XSCR.shape, -1, dtype=np.int32), np.full(XSCR.shape, np.nan)
+        n[~inside], zabs[~inside] = iterate_array(z[~inside], c[~inside], params["nmax"], params["amax"], params["power"],
+                                                  params.get("interior", False), final=True, **kernel_options(params))
+        buffer[y0:y0 + rows] = smooth_counts(n, zabs, params["amax"], params["power"])
+    return buffer
+
+# nombre d'itérations pour toute l'image décrite par params, par perturbation si la vue est trop profonde pour les float
+# (pour des params de balayage, avec les constantes "cs": les images de julia_sweep; avec "smooth": compute_smooth)
+def render_view(params):
+    if "cs" in params:
+        return julia_sweep(params, params["cs"])
+    if is_deep(params):
+        return render_perturbation(params)
+    if params.get("smooth", False):
+        return compute_smooth(params)
+    return compute_escape(params)
+
+# table des couleurs RGB (nmax+1 lignes, uint8) pour les nombres d'itérations 0..nmax-1
+# la dernière ligne, d'indice -1, est la couleur conv de la partie convergente (nmax atteint)
+def build_palette(nmax, cmap, factor, exponent, red, green, blue, conv):
+    n_scaled = factor*np.arange(nmax, dtype=float)**exponent # apply exponent for changing color depth
+    if cmap is None:
+        # autres essais: n, sqrt(n), log(n), n**2, n*log(n) à la place de n_scaled
+        rgb = np.stack([(red*n_scaled) % 256, (green*n_scaled) % 256, (blue*n_scaled) % 256], axis=1)
+    else:
+        # map n into the length of the colormap (usually len = 256), multiply value (between 0 and 1) by 255 for real RGB value
+        colors = np.asarray(cmap.colors if hasattr(cmap, "colors") else cmap(np.linspace(0, 1, cmap.N)))[:, :3]
+        rgb = (colors[n_scaled.astype(int) % len(colors)]*255).astype(int) * (red, green, blue) % 256
+    palette = np.empty((nmax + 1, 3), dtype=np.uint8)
+    palette[:nmax] = rgb
+    palette[-1] = conv
+    return palette
+
+# pixels RGB d'un buffer colorés par palette; pour des nombres d'itérations continus (float, voir compute_smooth), la
+# couleur est interpolée entre celles des deux nombres entiers voisins
+def color_buffer(buffer, palette):
+    if buffer.dtype.kind != "f":
+        return palette[buffer]
+    nmax = len(palette) - 1
+    n = np.floor(buffer).astype(np.int32) # -1 reste -1: couleur de la partie convergente
+    t = (buffer - n)[..., None]
+    rgb = palette[n]*(1 - t) + palette[np.where(n >= 0, np.minimum(n + 1, nmax - 1), -1)]*t
+    return rgb.round().astype(np.uint8)
+
+# nombre d'itérations pour toute l'image décrite par params, calculé par blocs de lignes
+# retourne un tableau buffer[YSCR, XSCR] de taille hauteur x largeur; les mesures du calcul sont ajoutées à stats
+def compute_escape(params, orbit=None, stats=None):
+    largeur, hauteur = params["largeur"], params["hauteur"]
+    buffer = np.empty((hauteur, largeur), dtype=np.int32)
+    rows = max(1, BLOCK_PIXELS // largeur)
+    XSCR = np.arange(largeur)
+    for y0 in range(0, hauteur, rows):
+        YSCR = np.arange(y0, min(y0 + rows, hauteur))
+        buffer[y0:y0 + len(YSCR)] = compute_pixels(params, XSCR[None, :], YSCR[:, None], orbit, stats)
+    return buffer
+
+# passes du rendu progressif: pas en pixels, de 1/8 de la résolution jusqu'à la résolution complète
+PASSES = (8, 4, 2, 1)
+
+# indices XSCR, YSCR des pixels de la zone (y0:y1, x0:x1) à calculer dans la passe de pas step
+# seuls les pixels multiples de step, et pas déjà calculés à la passe précédente (multiples de 2*step), sauf pour la 1ère
+def pass_pixels(step, first, y0, y1, x0, x1):
+    YSCR, XSCR = np.meshgrid(np.arange(-(-y0 // step)*step, y1, step), np.arange(-(-x0 // step)*step, x1, step), indexing="ij")
+    if not first:
+        todo = (YSCR % (2*step) != 0) | (XSCR % (2*step) != 0)
+        return XSCR[todo], YSCR[todo]
+    return XSCR.ravel(), YSCR.ravel()
+
+# calcul d'une passe du rendu progressif dans buffer (et l'état des orbites dans orbit), par bandes de lignes
+# générateur qui rend la main après chaque bande, pour que l'appelant puisse traiter les événements ou annuler
+# avec reference (voir perturbation_reference), les pixels sont calculés par perturbation, sans état des orbites
+def render_pass(params, buffer, step, first, orbit=None, stats=None, reference=None):
+    largeur, hauteur = params["largeur"], params["hauteur"]
+    rows = max(PASSES[0], BLOCK_PIXELS*step*step // largeur // PASSES[0] * PASSES[0]) # environ BLOCK_PIXELS pixels par bande
+    for y0 in range(0, hauteur, rows):
+        XSCR, YSCR = pass_pixels(step, first, y0, min(y0 + rows, hauteur), 0, largeur)
+        if reference is not None:
+            buffer[YSCR, XSCR] = perturbation_pixels(params, reference, XSCR, YSCR, stats)
+        else:
+            buffer[YSCR, XSCR] = compute_pixels(params, XSCR, YSCR, orbit, stats)
+        yield
+
+# aperçu plein format d'un buffer dont seuls les pixels multiples de step sont calculés: chacun remplit un carré step x step
+def upscale(buffer, step):
+    hauteur, largeur = buffer.shape
+    return np.repeat(np.repeat(buffer[::step, ::step], step, axis=0), step, axis=1)[:hauteur, :largeur]
+
+# taille (en pixels) en dessous de laquelle un rectangle de la subdivision n'est plus découpé mais calculé entièrement
+SUBDIVIDE_MIN = 6
+
+# rendu par subdivision (Mariani-Silver) de la zone [y0..y1] x [x0..x1] (bornes incluses) de buffer, dont les pixels
+# pas encore calculés valent -2: le bord de chaque rectangle est calculé d'abord; s'il n'a qu'une seule valeur,
+# l'intérieur en est rempli sans itérer, sinon le rectangle est découpé en 4 par une croix, jusqu'à SUBDIVIDE_MIN
+# les rectangles d'un même niveau sont traités ensemble, pour calculer leurs pixels en un seul appel vectoriel
+# les pixels remplis sans itérer n'ont pas d'état dans orbit: ils ne peuvent pas être continués par deepen
+# retourne le nombre de pixels itérés; les mesures du calcul sont ajoutées à stats
+def subdivide(params, buffer, y0, y1, x0, x1, orbit=None, stats=None):
+    largeur = buffer.shape[1]
+    count = 0
+    # calcul des pixels (X, Y) qui ne sont pas encore calculés
+    def fill(XSCR, YSCR):
+        nonlocal count
+        YSCR, XSCR = np.divmod(np.unique(YSCR*largeur + XSCR), largeur)
+        todo = buffer[YSCR, XSCR] == -2
+        XSCR, YSCR = XSCR[todo], YSCR[todo]
+        if XSCR.size:
+            buffer[YSCR, XSCR] = compute_pixels(params, XSCR, YSCR, orbit, stats)
+            count += XSCR.size
+    cols, rows = np.arange(x0, x1 + 1), np.arange(y0, y1 + 1)
+    fill(np.concatenate((cols, cols, np.full(rows.size, x0), np.full(rows.size, x1))),
+         np.concatenate((np.full(cols.size, y0), np.full(cols.size, y1), rows, rows)))
+    rects = [(y0, y1, x0, x1)]
+    while rects:
+        XSCR, YSCR, split = [], [], []
+        for a, b, c, d in rects:
+            if b - a < 2 or d - c < 2: # pas d'intérieur
+                continue
+            edges = np.concatenate((buffer[a, c:d + 1], buffer[b, c:d + 1], buffer[a + 1:b, c], buffer[a + 1:b, d]))
+            if (edges == edges[0]).all():
+                buffer[a + 1:b, c + 1:d] = edges[0]
+            elif b - a <= SUBDIVIDE_MIN or d - c <= SUBDIVIDE_MIN:
+                Yi, Xi = np.mgrid[a + 1:b, c + 1:d]
+                XSCR.append(Xi.ravel())
+                YSCR.append(Yi.ravel())
+            else: # croix qui découpe le rectangle en 4
+                m, n = (a + b) // 2, (c + d) // 2
+                XSCR += [np.arange(c + 1, d), np.full(b - a - 1, n)]
+                YSCR += [np.full(d - c - 1, m), np.arange(a + 1, b)]
+                split += [(a, m, c, n), (a, m, n, d), (m, b, c, n), (m, b, n, d)]
+        if XSCR:
+            fill(np.concatenate(XSCR), np.concatenate(YSCR))
+        rects = split
+    return count
+
+# écart (en pixels) toléré entre l'axe de symétrie et une ligne ou une demi-ligne de pixels, pour les erreurs d'arrondi
+SYMMETRY_TOL = 1e-6
+
+# rendu complet de l'image décrite par params par subdivision, en utilisant les symétries de la fractale:
+# Mandelbrot est symétrique par rapport à l'axe réel, Julia par rapport à l'origine quand power est pair
+# ((-z)**power == z**power). Quand la vue contient l'axe (ou l'origine) et que les pixels sont symétriques deux à deux
+# (l'axe tombe sur une ligne de pixels ou entre deux, à SYMMETRY_TOL pixel près, et de même pour la colonne de
+# l'origine pour Julia), seules les lignes du plus grand côté sont calculées, les autres pixels sont copiés depuis
+# leur pixel symétrique; sinon toute la vue est subdivisée. Les tuiles de la zone calculée sont subdivisées dans le pool
+# de renderer s'il est donné. Le nombre de pixels itérés est ajouté à stats["iterated"], avec les mesures du calcul
+# retourne le buffer et None pour l'état des orbites: les pixels remplis sans itérer n'en ont pas, deepen doit donc
+# reprendre tous les pixels qui atteignent nmax depuis z0
+def render_subdivide(params, stats=None, renderer=None):
+    largeur, hauteur = params["largeur"], params["hauteur"]
+    xmin, xmax, ymin, ymax = (float(params[k]) for k in ("xmin", "xmax", "ymin", "ymax"))
+    dx, dy = (xmax - xmin) / largeur, (ymax - ymin) / hauteur
+    buffer = renderer.buffer((hauteur, largeur)) if renderer is not None else np.empty((hauteur, largeur), dtype=np.int32)
+    buffer[:] = -2
+    r0, r1, axis = 0, hauteur - 1, None
+    # pixels symétriques deux à deux: la ligne du symétrique de la ligne r est 2*ymax/dy - r (colonne -2*xmin/dx - c)
+    def integer(v):
+        return abs(v - round(v)) < SYMMETRY_TOL
+    if ymin < 0 < ymax and integer(2*ymax/dy) and (params["Dtyp"] == "PlotMandel" or (params["power"] % 2 == 0 and xmin < 0 < xmax and integer(-2*xmin/dx))):
+        axis = round(2*ymax/dy) / 2 # ligne (entière ou demi-entière) de l'axe réel
+        r0, r1 = (0, int(axis)) if axis >= hauteur / 2 else (int(math.ceil(axis)), hauteur - 1)
+    if renderer is not None:
+        count = renderer.subdivide(params, r0, r1, stats)
+    else:
+        count = subdivide(params, buffer, r0, r1, 0, largeur - 1, stats=stats)
+    if axis is not None:
+        rows = np.arange(hauteur)
+        mirror = int(2*axis) - rows
+        ok = ((rows < r0) | (rows > r1)) & (mirror >= r0) & (mirror <= r1)
+        if params["Dtyp"] == "PlotMandel": # orbite du point conjugué: conjuguée
+            buffer[rows[ok]] = buffer[mirror[ok]]
+        else: # orbite du point opposé: identique dès la 1ère itération
+            cols = np.arange(largeur)
+            mirror_cols = round(-2*xmin/dx) - cols
+            okc = (mirror_cols >= 0) & (mirror_cols < largeur)
+            buffer[np.ix_(rows[ok], cols[okc])] = buffer[np.ix_(mirror[ok], mirror_cols[okc])]
+    # pixels dont le symétrique est hors de la vue
+    YSCR, XSCR = np.nonzero(buffer == -2)
+    if XSCR.size:
+        buffer[YSCR, XSCR] = compute_pixels(params, XSCR, YSCR, stats=stats)
+        count += XSCR.size
+    if stats is not None:
+        stats["iterated"] = stats.get("iterated", 0) + count
+    if renderer is not None:
+        return buffer.copy(), None
+    return buffer, None
+
+# mémoires partagées déjà attachées dans un processus de calcul, par nom, et numéro du rendu en cours
+_worker_shm = {}
+_worker_generation = None
+
+def _init_worker(generation):
+    global _worker_generation
+    _worker_generation = generation
+
+# tableaux de la mémoire partagée d'un rendu hauteur x largeur: l'état des orbites (hauteur, largeur, 2), suivi du buffer
+def shared_arrays(shm, shape):
+    orbit = np.ndarray(shape + (2,), dtype=complex, buffer=shm.buf)
+    return np.ndarray(shape, dtype=np.int32, buffer=shm.buf, offset=orbit.nbytes), orbit
+
+# calcul d'une tuile (y0:y1, x0:x1) d'une passe dans un processus du pool, écrite directement dans le buffer en mémoire partagée
+# (step 0: la tuile est calculée par subdivision). La tuile est ignorée si le rendu auquel elle appartient a été annulé
+# entre temps. Retourne le nombre de pixels itérés et les mesures du calcul de la tuile
+def render_tile(task):
+    name, shape, params, generation, step, first, y0, y1, x0, x1 = task
+    stats = {}
+    if _worker_generation.value != generation:
+        return 0, stats
+    if name not in _worker_shm:
+        _worker_shm[name] = shared_memory.SharedMemory(name=name) # c'est le processus principal qui la détruira
+    buffer, orbit = shared_arrays(_worker_shm[name], shape)
+    if step == 0:
+        return subdivide(params, buffer, y0, y1 - 1, x0, x1 - 1, stats=stats), stats
+    XSCR, YSCR = pass_pixels(step, first, y0, y1, x0, x1)
+    n, state = compute_state(params, XSCR, YSCR, stats)
+    if _worker_generation.value == generation:
+        buffer[YSCR, XSCR], orbit[YSCR, XSCR] = n, state
+    return XSCR.size, stats
+
+# rendu parallèle par tuiles: l'image est découpée en tuiles de tile x tile pixels, distribuées une par une aux
+# processus du pool (un processus libre prend la tuile suivante, le temps de calcul variant beaucoup d'une tuile à l'autre)
+# les processus écrivent les nombres d'itérations (et l'état des orbites) dans une mémoire partagée, rien n'est
+# sérialisé au retour
+class TileRenderer:
+
+    def __init__(self, workers, tile=64):
+        resource_tracker.ensure_running() # partagé avec les processus du pool, qui ne détruisent donc pas la mémoire partagée
+        self.generation = RawValue("i", 0)
+        self.pool = Pool(workers, initializer=_init_worker, initargs=(self.generation,))
+        self.workers, self.tile = workers, tile
+        self.shm, self.shape = None, None
+
+    # buffer hauteur x largeur en mémoire partagée, réalloué seulement si la taille change
+    def buffer(self, shape):
+        if shape != self.shape:
+            self.release()
+            self.shm = shared_memory.SharedMemory(create=True, size=36*shape[0]*shape[1])
+            self.shape = shape
+        return shared_arrays(self.shm, shape)[0]
+
+    # état des orbites arrêtées par nmax du dernier rendu, en mémoire partagée
+    def orbit(self):
+        return shared_arrays(self.shm, self.shape)[1]
+
+    # calcul d'une passe de pas step de l'image décrite par params, dans le buffer partagé
+    # générateur qui rend la main après chaque tuile terminée, avec ses mesures; les tuiles sont de taille tile*step
+    # pour garder à peu près le même nombre de pixels par tuile à chaque passe
+    def render_pass(self, params, step, first):
+        largeur, hauteur = params["largeur"], params["hauteur"]
+        self.buffer((hauteur, largeur))
+        tile = self.tile*step
+        tasks = [(self.shm.name, self.shape, params, self.generation.value, step, first,
+                  y0, min(y0 + tile, hauteur), x0, min(x0 + tile, largeur))
+                 for y0 in range(0, hauteur, tile) for x0 in range(0, largeur, tile)]
+        for _, stats in self.pool.imap_unordered(render_tile, tasks, chunksize=1):
+            yield stats
+
+    # calcule par subdivision les tuiles des lignes r0..r1 du buffer partagé (préparé par render_subdivide)
+    # retourne le nombre de pixels itérés; les mesures du calcul des tuiles sont ajoutées à stats
+    def subdivide(self, params, r0, r1, stats=None):
+        largeur, tile = params["largeur"], 2*self.tile
+        tasks = [(self.shm.name, self.shape, params, self.generation.value, 0, True, y0, min(y0 + tile, r1 + 1), x0, min(x0 + tile, largeur))
+                 for y0 in range(r0, r1 + 1, tile) for x0 in range(0, largeur, tile)]
+        count = 0
+        for n, tile_stats in self.pool.imap_unordered(render_tile, tasks, chunksize=1):
+            count += n
+            add_stats(stats, **tile_stats)
+        return count
+
+    # calcule toutes les tuiles de l'image décrite par params et retourne une copie du buffer et de l'état des orbites
+    # les mesures du calcul des tuiles sont ajoutées à stats
+    def compute(self, params, stats=None):
+        for tile_stats in self.render_pass(params, 1, True):
+            add_stats(stats, **tile_stats)
+        return self.buffer(self.shape).copy(), self.orbit().copy()
+
+    # calcule les buffers complets de plusieurs images (petites, comme les tuiles de render_from_tiles), dans l'ordre
+    def compute_many(self, params_list):
+        return self.pool.imap(render_view, params_list)
+
+    # annule le rendu en cours: les tuiles encore en attente sont ignorées par les processus
+    def cancel(self):
+        self.generation.value += 1
+
+    def release(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm, self.shape = None, None
+
+    def close(self):
+        self.pool.terminate()
+        self.release()
+
+# cache LRU des buffers de nombres d'itérations, indexé par tous les paramètres du rendu (make_params)
+# la mémoire occupée est limitée à max_bytes: les buffers les moins récemment utilisés sont retirés, et écrits
+# compressés dans directory si un répertoire est donné, d'où ils peuvent être relus plus tard
+class RenderCache:
+
+    def __init__(self, max_bytes, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits, self.disk_hits, self.misses = 0, 0, 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(params):
+        return json.dumps(params, sort_keys=True, default=str)
+
+    def path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + ".npz")
+
+    # buffer pour ces paramètres, ou None s'il n'est ni en mémoire ni sur disque
+    def get(self, params):
+        key = self.key(params)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        if self.directory and os.path.exists(self.path(key)):
+            with np.load(self.path(key)) as data:
+                buffer = data["buffer"]
+            self.disk_hits += 1
+            self.store(key, buffer)
+            return buffer
+        self.misses += 1
+        return None
+
+    def put(self, params, buffer):
+        key = self.key(params)
+        if key in self.entries:
+            self.nbytes -= self.entries.pop(key).nbytes
+        self.store(key, buffer)
+
+    def store(self, key, buffer):
+        self.entries[key] = buffer
+        self.nbytes += buffer.nbytes
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            self.spill(*self.entries.popitem(last=False))
+
+    # retire un buffer de la mémoire, en l'écrivant sur disque si le cache a un répertoire
+    def spill(self, key, buffer):
+        self.nbytes -= buffer.nbytes
+        if self.directory and not os.path.exists(self.path(key)):
+            np.savez_compressed(self.path(key), buffer=buffer)
+
+    def stats(self):
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                "entries": len(self.entries), "bytes": self.nbytes}
+
+    # à la fin: écrire sur disque les buffers encore en mémoire
+    def close(self):
+        while self.entries:
+            self.spill(*self.entries.popitem(last=False))
+
+# nombre de niveaux de la pyramide de tuiles par facteur 2 de zoom: la taille des pixels d'une tuile est au plus
+# 2**(1/LEVELS_PER_OCTAVE) fois plus petite que celle des pixels de la vue, ce qui limite le calcul en trop
+LEVELS_PER_OCTAVE = 4
+
+# rendu d'une vue à partir de tuiles définies dans le plan de la fractale (et non de l'écran), gardées dans cache
+# au niveau level, les pixels des tuiles sont les points (gx, gy)*2**(level/LEVELS_PER_OCTAVE) du plan; une tuile est
+# repérée par (level, ix, iy) et couvre tile x tile points. Chaque pixel de la vue prend la valeur du point le plus
+# proche au niveau choisi: les vues qui se recouvrent (zoom, retour en arrière) réutilisent les tuiles déjà calculées,
+# seules les tuiles manquantes sont calculées, par compute_many (liste de params -> buffers) ou dans ce processus
+# retourne None si cancelled() devient vrai entre deux tuiles; stats reçoit les nombres de tuiles trouvées dans le
+# cache et calculées, et les mesures du calcul (sauf pour compute_many, qui ne les retourne pas)
+def render_from_tiles(params, cache, tile=64, compute_many=None, cancelled=None, stats=None):
+    largeur, hauteur = params["largeur"], params["hauteur"]
+    xmin, xmax, ymin, ymax = (float(params[k]) for k in ("xmin", "xmax", "ymin", "ymax"))
+    dx, dy = (xmax - xmin) / largeur, (ymax - ymin) / hauteur
+    level = math.floor(math.log2(min(dx, dy)) * LEVELS_PER_OCTAVE)
+    step = 2.0 ** (level / LEVELS_PER_OCTAVE) # taille des pixels des tuiles de ce niveau
+    # point le plus proche de chaque colonne et de chaque ligne de la vue, et tuile qui le contient
+    ix, col = np.divmod(np.rint((np.arange(largeur)*dx + xmin) / step).astype(np.int64), tile)
+    iy, row = np.divmod(np.rint((ymax - np.arange(hauteur)*dy) / step).astype(np.int64), tile)
+    ixs, ix_k = np.unique(ix, return_inverse=True)
+    iys, iy_k = np.unique(iy, return_inverse=True)
+    # chaque tuile est décrite par des params de rendu tile x tile, qui servent aussi de clé dans le cache
+    base = {k: params[k] for k in ("Dtyp", "nmax", "cx", "cy", "power", "amax", "interior", "kernel", "float32")}
+    tiles = [dict(base, level=level, ix=int(i), iy=int(j), largeur=tile, hauteur=tile,
+                  xmin=int(i)*tile*step, xmax=(int(i) + 1)*tile*step, ymin=(int(j)*tile - 1)*step, ymax=(int(j)*tile + tile - 1)*step)
+             for j in iys for i in ixs]
+    stack = np.empty((len(tiles), tile, tile), dtype=np.int32)
+    missing = []
+    for k, t in enumerate(tiles):
+        buffer = cache.get(t)
+        if buffer is None:
+            missing.append(k)
+        else:
+            stack[k] = buffer
+    add_stats(stats, tile_hits=len(tiles) - len(missing), tile_misses=len(missing))
+    results = compute_many([tiles[k] for k in missing]) if compute_many is not None else (compute_escape(tiles[k], stats=stats) for k in missing)
+    for k, buffer in zip(missing, results):
+        stack[k] = buffer
+        cache.put(tiles[k], buffer)
+        if cancelled is not None and cancelled():
+            return None
+    # la ligne 0 d'une tuile est son point le plus haut (ymax), comme pour l'écran
+    k = iy_k[:, None]*len(ixs) + ix_k[None, :]
+    return stack[k, tile - 1 - row[:, None], col[None, :]]
+
+# paramètres de rendu d'une commande json (format des jstring de plot_Mandelbrot et plot_Julia), None si ce n'est pas un plot
+# les bornes et c en string sont des coordonnées haute précision; power, amax, largeur, hauteur, kernel (noyau
+# d'itération) et float32 peuvent remplacer ceux des options
+# TypeError ou ValueError pour une commande qui n'est pas un objet json ou dont une valeur n'a pas le bon type
+def command_params(jdict, **options):
+    if not isinstance(jdict, dict):
+        raise TypeError("json command is not an object: {!r}".format(jdict))
+    if jdict.get("Dtyp") not in ("PlotMandel", "PlotJulia"):
+        return None
+    options.update((k, jdict[k]) for k in ("power", "amax", "largeur", "hauteur", "kernel", "float32") if k in jdict)
+    for k, v in dict(options, nmax=jdict["nmax"]).items():
+        if k in ("nmax", "largeur", "hauteur") and (isinstance(v, bool) or not isinstance(v, int) or v < 1):
+            raise ValueError("{} is not a positive integer: {!r}".format(k, v))
+        if k in ("power", "amax") and (isinstance(v, bool) or not isinstance(v, (int, float))):
+            raise TypeError("{} is not a number: {!r}".format(k, v))
+    values = [jdict[k] for k in ("xmin", "xmax", "ymin", "ymax")] + [jdict.get("cx", 0), jdict.get("cy", 0)]
+    if any(isinstance(v, bool) or not isinstance(v, (int, float, str, Decimal)) for v in values):
+        raise TypeError("bounds and c must be numbers or strings: {!r}".format(values))
+    xmin, xmax, ymin, ymax, cx, cy = (to_number(v) for v in values)
+    if not all(math.isfinite(v) for v in (xmin, xmax, ymin, ymax, cx, cy)) or xmin >= xmax or ymin >= ymax:
+        raise ValueError("invalid view: {!r}".format(values))
+    if any(isinstance(v, Decimal) for v in (xmin, xmax, ymin, ymax)):
+        xmin, xmax, ymin, ymax = (to_decimal(v) for v in (xmin, xmax, ymin, ymax))
+    return make_params(jdict["Dtyp"], xmin, xmax, ymin, ymax, jdict["nmax"], cx, cy, **options)
+
+# courbes d'accélération des animations: avancement du zoom pour le temps t de 0 à 1
+EASINGS = {"linear": lambda t: t, "in": lambda t: t*t, "out": lambda t: t*(2 - t), "smooth": lambda t: t*t*(3 - 2*t)}
+
+# params des frames d'une animation de zoom (commande json "AnimMandel" ou "AnimJulia"), de la vue de la commande
+# à la vue de sa clé "target" (bornes, et éventuellement nmax) en "frames" images. La largeur et la hauteur de la vue
+# varient géométriquement (zoom à vitesse constante, modulée par la courbe "easing" de EASINGS) et le centre se
+# déplace avec elles, pour que le point fixe du zoom reste au même endroit de l'écran. Les bornes sont des Decimal
+# retourne un générateur: la mémoire ne dépend pas du nombre de frames
+def zoom_frames(jdict, **options):
+    plot = jdict["Dtyp"].replace("Anim", "Plot")
+    start = command_params(dict(jdict, Dtyp=plot), **options)
+    end = command_params(dict(jdict, Dtyp=plot, **jdict["target"]), **options)
+    ease, frames = EASINGS[jdict.get("easing", "linear")], int(jdict["frames"])
+    a, b = ({k: to_decimal(p[k]) for k in ("xmin", "xmax", "ymin", "ymax")} for p in (start, end))
+    def views():
+        for f in range(frames):
+            t = Decimal(ease(f / max(1, frames - 1)))
+            bounds = []
+            for lo, hi in (("xmin", "xmax"), ("ymin", "ymax")):
+                w0, w1 = a[hi] - a[lo], b[hi] - b[lo]
+                c0, c1 = (a[lo] + a[hi]) / 2, (b[lo] + b[hi]) / 2
+                w = w0 * (w1 / w0) ** t
+                c = c0 + (c1 - c0) * ((w - w0) / (w1 - w0) if w1 != w0 else t) # centre linéaire en w: point fixe
+                bounds += [c - w / 2, c + w / 2]
+            nmax = round(start["nmax"] + (end["nmax"] - start["nmax"]) * float(t))
+            yield dict(start, nmax=nmax, xmin=bounds[0], xmax=bounds[1], ymin=bounds[2], ymax=bounds[3])
+    return views()
+
+# buffers des frames d'une animation (params de zoom_frames), calculées exactement par groupes de window, par
+# compute_many (liste de params -> buffers) si possible
+# générateur des couples (params, buffer) des frames, dans l'ordre; seules les frames d'un groupe sont gardées
+def animate(frames, compute_many=None, window=8):
+    while True:
+        group = list(itertools.islice(frames, window))
+        if not group:
+            return
+        results = compute_many(group) if compute_many is not None else map(render_view, group)
+        yield from zip(group, results)
+
+# taille par défaut en pixels des images d'un balayage de Julia
+SWEEP_THUMB = 128
+
+# constantes c d'un balayage de Julia (commande json "SweepJulia"): grille "grid" (bornes xmin, xmax, ymin, ymax et
+# nombres de points nx, ny; les lignes vont de ymax à ymin, comme l'écran), ou chemin "path" (liste de points [cx, cy])
+# parcouru à vitesse constante en "frames" points
+# retourne le tableau des c et la forme (ny, nx) de la grille, None pour un chemin
+def sweep_constants(jdict):
+    if "grid" in jdict:
+        grid = jdict["grid"]
+        cx, cy = np.meshgrid(np.linspace(grid["xmin"], grid["xmax"], grid["nx"]), np.linspace(grid["ymax"], grid["ymin"], grid["ny"]))
+        return (cx + 1j*cy).ravel(), (grid["ny"], grid["nx"])
+    points = np.array([complex(cx, cy) for cx, cy in jdict["path"]])
+    length = np.concatenate([[0], np.cumsum(abs(np.diff(points)))]) # abscisse curviligne des points
+    t = np.linspace(0, length[-1], int(jdict["frames"]))
+    return np.interp(t, length, points.real) + 1j*np.interp(t, length, points.imag), None
+
+# écrit un buffer dans le fichier path: .npy pour le buffer brut des nombres d'itérations (continus en float32 pour
+# les vues "smooth"), .rgb pour les pixels
+# colorés bruts (RGB 8 bits, ligne par ligne) ajoutés au flux streams[path], ouvert à la première image (les frames
+# d'une animation se suivent dans le même fichier, qui peut être un pipe vers un encodeur vidéo), sinon une image
+# colorée par palette (voir build_palette) dans le format donné par l'extension (png, bmp, tga, jpg)
+def write_buffer(path, buffer, palette, streams=None):
+    if path.endswith(".npy"):
+        np.save(path, buffer)
+    elif path.endswith(".rgb"):
+        if path not in streams:
+            streams[path] = open(path, "wb")
+        streams[path].write(color_buffer(buffer, palette).tobytes())
+    else:
+        pygame.image.save(pygame.surfarray.make_surface(color_buffer(buffer, palette).swapaxes(0, 1)), path) # sans ouvrir de fenêtre
+
+# écrit une image largeur x hauteur dans le fichier PNG path, à partir des bandes de lignes successives de bands
+# (tableaux lignes x largeur x 3 de uint8), compressées au fur et à mesure: la mémoire utilisée est celle d'une bande
+def write_png(path, largeur, hauteur, bands):
+    with open(path, "wb") as f:
+        def chunk(kind, data):
+            f.write(struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data)))
+        f.write(b"\x89PNG\r\n\x1a\n")
+        chunk(b"IHDR", struct.pack(">IIBBBBB", largeur, hauteur, 8, 2, 0, 0, 0)) # 8 bits RGB, sans entrelacement
+        compressor = zlib.compressobj(6)
+        for rgb in bands:
+            band = np.zeros((len(rgb), 1 + 3*largeur), dtype=np.uint8) # chaque ligne: filtre 0 puis les pixels
+            band[:, 1:] = rgb.reshape(len(rgb), -1)
+            data = compressor.compress(band.tobytes())
+            if data:
+                chunk(b"IDAT", data)
+        chunk(b"IDAT", compressor.flush())
+        chunk(b"IEND", b"")
+
+# taille par défaut en pixels des tuiles des posters
+POSTER_TILE = 1024
+
+# rendu d'un poster: l'image de params, de taille largeur x hauteur quelconque (indépendante de la fenêtre), est
+# calculée tuile par tuile dans des fichiers du répertoire directory projetés en mémoire (memmap): buffer.npy pour les
+# nombres d'itérations et rgb.npy pour l'image colorée par palette, puis écrite par bandes dans poster.png
+# done.npy marque les tuiles terminées, après que leurs pixels ont été écrits sur le disque: un rendu interrompu
+# reprend là où il s'est arrêté quand il est relancé avec les mêmes params (décrits dans poster.json)
+# les tuiles sont calculées par groupes de window, par compute_many (liste de params -> buffers) si possible, et les
+# fichiers ne sont projetés que le temps d'écrire un groupe: la mémoire utilisée est celle d'un groupe de tuiles,
+# pas celle de l'image
+# un aperçu réduit à preview_size (largeur, hauteur) est rempli au fur et à mesure et passé à
+# progress(aperçu, tuiles terminées, nombre de tuiles) après chaque groupe, puis écrit dans preview.png
+# retourne l'aperçu, ou None si cancelled() devient vrai entre deux groupes (le rendu pourra être repris)
+def render_poster(params, directory, palette, tile=POSTER_TILE, preview_size=(700, 700), compute_many=None, window=8,
+                  progress=None, cancelled=None):
+    largeur, hauteur = params["largeur"], params["hauteur"]
+    ny, nx = -(-hauteur // tile), -(-largeur // tile)
+    os.makedirs(directory, exist_ok=True)
+    path = lambda name: os.path.join(directory, name)
+    try:
+        with open(path("poster.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = {}
+    # buffer, image et tuiles terminées, créés vides s'ils ne sont pas repris d'un rendu interrompu
+    def open_files(mode="r+"):
+        return (np.lib.format.open_memmap(path("buffer.npy"), mode, np.int32, (hauteur, largeur)),
+                np.lib.format.open_memmap(path("rgb.npy"), mode, np.uint8, (hauteur, largeur, 3)),
+                np.lib.format.open_memmap(path("done.npy"), mode, np.uint8, (ny, nx)))
+    resume = ( meta.get("params") == RenderCache.key(params) and meta.get("tile") == tile )
+    buffer, rgb, done = open_files("r+" if resume else "w+")
+    # points de l'aperçu: le pixel du poster le plus proche
+    scale = max(largeur / preview_size[0], hauteur / preview_size[1], 1)
+    prow = (np.arange(int(hauteur / scale))*scale).astype(np.intp)
+    pcol = (np.arange(int(largeur / scale))*scale).astype(np.intp)
+    preview = np.full((len(prow), len(pcol)), -1, dtype=np.int32)
+    # copie dans l'aperçu des points de la tuile (j, i), dont les nombres d'itérations sont dans block
+    def show(j, i, block):
+        r = np.nonzero(prow // tile == j)[0]
+        c = np.nonzero(pcol // tile == i)[0]
+        preview[np.ix_(r, c)] = block[prow[r][:, None] - j*tile, pcol[c][None, :] - i*tile]
+    todo = [(j, i) for j in range(ny) for i in range(nx) if not done[j, i]]
+    finished = list(zip(*np.nonzero(done)))
+    del buffer, rgb, done # fermer les memmaps
+    colors = hashlib.sha1(palette.tobytes()).hexdigest()
+    for j, i in finished: # tuiles du rendu interrompu
+        buffer, rgb, _ = open_files()
+        block = (slice(j*tile, (j + 1)*tile), slice(i*tile, (i + 1)*tile))
+        if meta.get("palette") != colors: # couleurs changées depuis
+            rgb[block] = palette[buffer[block]]
+            rgb.flush()
+        show(j, i, buffer[block])
+        del buffer, rgb
+    with open(path("poster.json"), "w") as f:
+        json.dump({"params": RenderCache.key(params), "tile": tile, "palette": colors}, f)
+    # params de la tuile (j, i): même grille de points que le poster
+    xmin, xmax, ymin, ymax = (params[k] for k in ("xmin", "xmax", "ymin", "ymax"))
+    if any(isinstance(v, Decimal) for v in (xmin, xmax, ymin, ymax)):
+        xmin, xmax, ymin, ymax = (to_decimal(v) for v in (xmin, xmax, ymin, ymax))
+    dx, dy = (xmax - xmin) / largeur, (ymax - ymin) / hauteur
+    def tile_params(j, i):
+        y0, y1, x0, x1 = j*tile, min((j + 1)*tile, hauteur), i*tile, min((i + 1)*tile, largeur)
+        return dict(params, largeur=x1 - x0, hauteur=y1 - y0, xmin=xmin + x0*dx, xmax=xmin + x1*dx, ymin=ymax - y1*dy, ymax=ymax - y0*dy)
+    for k in range(0, len(todo), window):
+        group = todo[k:k + window]
+        tiles = [tile_params(j, i) for j, i in group]
+        results = compute_many(tiles) if compute_many is not None else map(render_view, tiles)
+        results = list(results)
+        buffer, rgb, done = open_files()
+        for (j, i), result in zip(group, results):
+            block = (slice(j*tile, (j + 1)*tile), slice(i*tile, (i + 1)*tile))
+            buffer[block] = result
+            rgb[block] = palette[result]
+            show(j, i, result)
+        buffer.flush()
+        rgb.flush()
+        for j, i in group:
+            done[j, i] = 1
+        done.flush() # les tuiles ne sont marquées terminées qu'une fois écrites
+        count = int(done.sum())
+        del buffer, rgb, done
+        if progress is not None:
+            progress(preview, count, ny*nx)
+        if cancelled is not None and cancelled():
+            return None
+    # bandes de l'image lues dans rgb.npy, projeté seulement le temps de copier chaque bande
+    def bands(rows=256):
+        for y0 in range(0, hauteur, rows):
+            yield np.array(np.load(path("rgb.npy"), mmap_mode="r")[y0:y0 + rows])
+    write_png(path("poster.png"), largeur, hauteur, bands())
+    write_buffer(path("preview.png"), preview, palette)
+    return preview
+
+# rendu sans fenêtre d'un flux de commandes json, une par ligne (lines: fichier ou stdin), dans des fichiers du
+# répertoire directory: le nom est donné par la clé "File" de la commande, sinon plot_<numéro de ligne>.<fmt>
+# avec "smooth": 1, les plots sont rendus en nombres d'itérations continus (voir compute_smooth)
+# les balayages de Julia ("SweepJulia", voir sweep_constants) sont écrits dans sweep_<numéro de ligne>.<fmt> (atlas
+# des images d'une grille) ou comme des animations pour un chemin; leurs images font "largeur" x "hauteur" pixels
+# (SWEEP_THUMB par défaut) et sont calculées par groupes, en parallèle par compute_many si possible
+# les posters ("PosterMandel", "PosterJulia", de taille "largeur" x "hauteur", voir render_poster) sont rendus
+# dans le répertoire poster_<numéro de ligne>, ou "File"
+# les animations de zoom ("AnimMandel", "AnimJulia", voir zoom_frames et animate) sont écrites dans les fichiers
+# anim_<numéro de ligne>_<numéro de frame>.<fmt> (un seul fichier anim_<numéro de ligne>.rgb pour le format rgb),
+# ou "File" où {} est remplacé par le numéro de frame
+# les commandes sont lues au fur et à mesure et calculées par groupes de window vues (en parallèle par compute_many,
+# liste de params -> buffers, sinon dans ce processus), pendant qu'un thread colore, encode et écrit les vues
+# précédentes; la file entre les deux limite la mémoire occupée par les buffers en attente d'écriture
+# palette(nmax) donne la table des couleurs, options les paramètres de rendu par défaut (voir command_params)
+# retourne le nombre de fichiers écrits
+def render_batch(lines, directory, fmt, palette, options, compute_many=None, window=8):
+    os.makedirs(directory, exist_ok=True)
+    pending = queue.Queue(maxsize=2*window)
+    written = []
+    streams = {}
+    def writer():
+        while True:
+            item = pending.get()
+            if item is None:
+                break
+            path, params, buffer = item
+            try:
+                write_buffer(path, buffer, palette(params["nmax"]), streams)
+            except (OSError, pygame.error) as error: # continuer avec les vues suivantes
+                print("Error writing {}: {}".format(path, error), flush=True)
+                continue
+            written.append(path)
+            print("Written:", path, flush=True)
+    thread = threading.Thread(target=writer)
+    thread.start()
+    # calcule un groupe de vues (chemin, params) et les passe au thread d'écriture
+    def flush(group):
+        params_list = [params for _, params in group]
+        results = iter(compute_many(params_list) if compute_many is not None else map(render_view, params_list))
+        for path, params in group:
+            try:
+                buffer = next(results) # l'erreur d'une vue ne fait pas perdre les suivantes
+            except (ArithmeticError, TypeError, ValueError, KeyError, MemoryError) as error:
+                print("Error rendering {}: {}".format(path, error), flush=True)
+                continue
+            pending.put((path, params, buffer))
+    start = time.perf_counter()
+    group = []
+    try:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                jdict = json.loads(line)
+                dtyp = jdict.get("Dtyp", "")
+                frames = zoom_frames(jdict, **options) if dtyp in ("AnimMandel", "AnimJulia") else None
+                poster = command_params(dict(jdict, Dtyp=dtyp.replace("Poster", "Plot")), **options) if dtyp in ("PosterMandel", "PosterJulia") else None
+                sweep = None
+                if dtyp == "SweepJulia":
+                    cs, grid = sweep_constants(jdict)
+                    sweep = command_params(dict(jdict, Dtyp="PlotJulia"), **dict(options, largeur=SWEEP_THUMB, hauteur=SWEEP_THUMB))
+                params = command_params(jdict, **options)
+            except (KeyError, TypeError, ValueError, AttributeError, ArithmeticError) as error: # JSONDecodeError est une ValueError
+                print("Error decoding json string line {}: {} ({})".format(number, line.strip(), error))
+                continue
+            try: # une commande qui échoue au calcul est signalée et sautée, comme une ligne invalide
+                if sweep is not None:
+                    flush(group) # les vues précédentes sont écrites avant le balayage
+                    group = []
+                    per = max(1, 4*BLOCK_PIXELS // (sweep["largeur"]*sweep["hauteur"]))
+                    tasks = [dict(sweep, cs=cs[k:k + per]) for k in range(0, len(cs), per)]
+                    groups = (tasks[k:k + window] for k in range(0, len(tasks), window)) # seul un groupe est calculé d'avance
+                    stacks = (stack for group in groups for stack in (compute_many(group) if compute_many is not None else map(render_view, group)))
+                    frames = (image for stack in stacks for image in stack)
+                    if grid is not None: # atlas: les images de la grille côte à côte
+                        ny, nx = grid
+                        atlas = np.stack(list(frames)).reshape(ny, nx, sweep["hauteur"], sweep["largeur"])
+                        name = os.path.join(directory, jdict.get("File", "sweep_{:06d}.{}".format(number, fmt)))
+                        pending.put((name, sweep, atlas.swapaxes(1, 2).reshape(ny*sweep["hauteur"], nx*sweep["largeur"])))
+                        continue
+                    name = "sweep_{:06d}.rgb".format(number) if fmt == "rgb" else "sweep_{:06d}_{{:06d}}.{}".format(number, fmt)
+                    name = os.path.join(directory, jdict.get("File", name))
+                    for k, (image, c) in enumerate(zip(frames, cs), 1):
+                        pending.put((name.format(k), dict(sweep, cx=c.real, cy=c.imag), image))
+                    continue
+                if poster is not None:
+                    flush(group) # les vues précédentes sont calculées avant le poster
+                    group = []
+                    name = os.path.join(directory, jdict.get("File", "poster_{:06d}".format(number)))
+                    render_poster(poster, name, palette(poster["nmax"]), jdict.get("tile", POSTER_TILE), (options["largeur"], options["hauteur"]),
+                                  compute_many, window, lambda preview, done, total: print("Poster {}: {} of {} tiles".format(name, done, total), flush=True))
+                    written.append(name)
+                    print("Written:", os.path.join(name, "poster.png"), flush=True)
+                    continue
+                if frames is not None:
+                    flush(group) # les vues précédentes sont écrites avant les frames
+                    group = []
+                    name = "anim_{:06d}.rgb".format(number) if fmt == "rgb" else "anim_{:06d}_{{:06d}}.{}".format(number, fmt)
+                    name = os.path.join(directory, jdict.get("File", name))
+                    for k, (params, buffer) in enumerate(animate(frames, compute_many, window), 1):
+                        pending.put((name.format(k), params, buffer))
+                    continue
+            except (KeyError, TypeError, ValueError, ArithmeticError, MemoryError) as error:
+                print("Error rendering line {}: {} ({})".format(number, line.strip(), error), flush=True)
+                continue
+            if params is None:
+                print("Not a plot command, line {}: {}".format(number, line.strip()))
+                continue
+            if jdict.get("smooth", False): # nombres d'itérations continus, couleurs interpolées
+                params["smooth"] = True
+            group.append((os.path.join(directory, jdict.get("File", "plot_{:06d}.{}".format(number, fmt))), params))
+            if len(group) == window:
+                flush(group)
+                group = []
+        flush(group)
+    finally:
+        pending.put(None)
+        thread.join()
+        for stream in streams.values():
+            stream.close()
+    print("Rendered {} views in {:.2f} s".format(len(written), time.perf_counter() - start))
+    return len(written)
+
+# canal de commandes json non bloquant pour la fenêtre: des threads lisent les commandes sur stdin (source "-") ou sur
+# les connexions d'un socket Unix (source: son chemin), une par ligne, et les mettent en attente; la boucle de pygame
+# les exécute avec drain(), et chaque commande reçoit une réponse json sur une ligne de sa source (stdout pour stdin)
+class CommandChannel:
+
+    def __init__(self, source=None):
+        self.lock = threading.Lock()
+        self.pending = [] # (jstring, panneau, reply, heure de réception)
+        self.answers = [] # (action, string) des réponses lues par prompt
+        self.source = source
+        self.reading = False # stdin est lu par un thread
+        self.server, self.path = None, None
+        if source == "-":
+            self.reading = True
+            threading.Thread(target=self.read, args=(sys.stdin, self.print_reply), daemon=True).start()
+        elif source is not None:
+            if os.path.exists(source) and stat.S_ISSOCK(os.stat(source).st_mode):
+                os.remove(source) # socket laissé par une exécution précédente
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server.bind(source)
+            self.server.listen()
+            self.path = source
+            threading.Thread(target=self.accept, daemon=True).start()
+
+    # panneau ("m" ou "j") d'une commande de plot: seule la dernière en attente pour chaque panneau est rendue
+    @staticmethod
+    def panel(jstring):
+        try:
+            return {"PlotMandel": "m", "PlotJulia": "j"}.get(json.loads(jstring).get("Dtyp"))
+        except (ValueError, AttributeError):
+            return None
+
+    def put(self, jstring, reply):
+        with self.lock:
+            self.pending.append((jstring, self.panel(jstring), reply, time.perf_counter()))
+
+    def read(self, lines, reply):
+        for line in lines:
+            if line.strip():
+                self.put(line.strip(), reply)
+
+    @staticmethod
+    def print_reply(message):
+        print(json.dumps({"Reply": message}), flush=True)
+
+    # lire une seule commande sur la console dans un thread, sans bloquer la fenêtre (touche i); avec action, la ligne
+    # lue n'est pas une commande: action(ligne) sera appelée par la boucle de pygame (voir answered, touche n)
+    def prompt(self, text, action=None):
+        if self.reading:
+            print("Commands are already read from stdin, one json string per line." if self.source == "-" else "A line is already being read from the console.")
+            return
+        self.reading = True
+        def read_one():
+            try:
+                jstring = input(text)
+            except EOFError:
+                jstring = ""
+            self.reading = False
+            if action is not None:
+                with self.lock:
+                    self.answers.append((action, jstring.strip()))
+            elif jstring.strip():
+                self.put(jstring.strip(), self.print_reply)
+        threading.Thread(target=read_one, daemon=True).start()
+
+    # réponses lues par prompt avec une action, en (action, string), à exécuter par la boucle de pygame
+    def answered(self):
+        with self.lock:
+            answers, self.answers = self.answers, []
+        return answers
+
+    def accept(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError: # socket fermé par close()
+                return
+            threading.Thread(target=self.serve, args=(conn,), daemon=True).start()
+
+    # lire les commandes d'une connexion; elle est fermée quand le client a fini d'écrire et que toutes ses commandes
+    # ont eu leur réponse
+    def serve(self, conn):
+        lock = threading.Lock()
+        state = {"waiting": 0, "eof": False}
+        def close_if_done():
+            if state["eof"] and state["waiting"] == 0:
+                conn.close()
+        def reply(message):
+            with lock:
+                try:
+                    conn.sendall((json.dumps(message) + "\n").encode())
+                except OSError: # client parti
+                    pass
+                state["waiting"] -= 1
+                close_if_done()
+        with conn.makefile("r") as lines:
+            try:
+                for line in lines:
+                    if line.strip():
+                        with lock:
+                            state["waiting"] += 1
+                        self.put(line.strip(), reply)
+            except OSError:
+                pass
+        with lock:
+            state["eof"] = True
+            close_if_done()
+
+    # y a-t-il une commande en attente pour ce panneau (elle annule le rendu en cours du panneau)
+    def waiting(self, panel):
+        with self.lock:
+            return any(p == panel for _, p, _, _ in self.pending)
+
+    # réponse à une commande reçue à received: son id et son type s'ils sont donnés, le statut et la durée totale
+    @staticmethod
+    def respond(reply, jstring, received, **message):
+        try:
+            jdict = json.loads(jstring)
+            message.update((k, jdict[k]) for k in ("id", "Dtyp") if isinstance(jdict, dict) and k in jdict)
+        except ValueError:
+            pass
+        reply(dict(message, time=time.perf_counter() - received))
+
+    # commandes à exécuter, dans l'ordre d'arrivée, en (jstring, reply, heure de réception); pour chaque panneau, seule
+    # la dernière commande de plot en attente est gardée, les précédentes reçoivent la réponse "coalesced"
+    def drain(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+        last = {p: i for i, (_, p, _, _) in enumerate(pending) if p is not None}
+        commands = []
+        for i, (jstring, p, reply, received) in enumerate(pending):
+            if p is not None and last[p] != i:
+                self.respond(reply, jstring, received, status="coalesced")
+            else:
+                commands.append((jstring, reply, received))
+        return commands
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+            os.remove(self.path)
+            self.server = None
+
+# mesures d'un rendu de params, au format json: les mesures de stats (durées des phases: coordonnées, itérations,
+# coloration, affichage; itérations faites...), la durée totale, les nombres de pixels qui divergent et qui atteignent
+# nmax dans buffer, et l'histogramme en bins classes du coût des tuiles (en itérations)
+def render_metrics(params, buffer, stats, total, bins=8):
+    metrics = {k: params[k] for k in ("Dtyp", "largeur", "hauteur", "nmax")}
+    metrics.update(kernel_options(params))
+    metrics.update((k, v) for k, v in stats.items() if k != "tile_costs")
+    metrics.update(total=total, escaped=int((buffer >= 0).sum()), max_depth=int((buffer < 0).sum()))
+    costs = stats.get("tile_costs")
+    if costs:
+        counts, edges = np.histogram(costs, bins=bins)
+        metrics["tile_cost"] = {"tiles": len(costs), "min": int(min(costs)), "max": int(max(costs)), "mean": float(np.mean(costs)),
+                                "histogram": counts.tolist(), "edges": edges.tolist()}
+    return metrics
+
+# catalogue fixe des vues du benchmark: nom, type, bornes (xmin, xmax, ymin, ymax), constante c de Julia et puissance
+# les bornes en string sont des coordonnées haute précision (vue profonde, rendue par perturbation)
+BENCH_VIEWS = [
+    ("full", "PlotMandel", (-2, 0.5, -1.25, 1.25), (0, 0), 2),
+    ("seahorse", "PlotMandel", (-0.76, -0.74, 0.09, 0.11), (0, 0), 2),
+    ("interior", "PlotMandel", (-0.6, 0.1, -0.35, 0.35), (0, 0), 2),
+    ("deep", "PlotMandel", ("-0.743643887041151", "-0.743643887033151", "0.131825904201330", "0.131825904209330"), (0, 0), 2),
+    ("power3", "PlotMandel", (-1.25, 1.25, -1.25, 1.25), (0, 0), 3),
+    ("power5", "PlotMandel", (-1.25, 1.25, -1.25, 1.25), (0, 0), 5),
+    ("julia-0.285", "PlotJulia", (-1.25, 1.25, -1.25, 1.25), (0.285, 0.01), 2),
+    ("julia-rabbit", "PlotJulia", (-1.25, 1.25, -1.25, 1.25), (-0.123, 0.745), 2),
+    ("julia-siegel", "PlotJulia", (-1.25, 1.25, -1.25, 1.25), (-0.390541, -0.586788), 2),
+    ("julia-dendrite", "PlotJulia", (-1.25, 1.25, -1.25, 1.25), (0, 1), 2),
+]
+# tailles (largeur = hauteur) et profondeurs nmax de chaque vue du benchmark
+BENCH_SIZES = (256, 512)
+BENCH_NMAX = (100, 1000)
+# profondeurs propres à certaines vues: la vue profonde n'a de pixels qui divergent qu'au delà de 1777 itérations
+BENCH_VIEW_NMAX = {"deep": (3000,)}
+
+# buffer de params calculé par le moteur du benchmark mode; renderer est le pool de processus du mode "pool"
+def bench_engine(params, mode, renderer=None):
+    if mode == "scan":
+        return compute_escape(dict(params, interior=False))
+    if mode == "generic": # comme scan, avec la puissance complexe générale au lieu du noyau spécialisé
+        return compute_escape(dict(params, interior=False, kernel="generic"))
+    if mode == "float32":
+        return compute_escape(dict(params, interior=False, float32=True))
+    if mode == "smooth":
+        return compute_smooth(dict(params, interior=False))
+    if mode == "interior":
+        return compute_escape(params)
+    if mode == "progressive":
+        buffer = np.empty((params["hauteur"], params["largeur"]), dtype=np.int32)
+        for step in PASSES:
+            for _ in render_pass(params, buffer, step, step == PASSES[0]):
+                pass
+        return buffer
+    if mode == "subdiv":
+        return render_subdivide(params)[0]
+    if mode == "tiles":
+        return render_from_tiles(params, RenderCache(1 << 30))
+    if mode == "pool":
+        return renderer.compute(params)[0]
+    if mode == "perturbation":
+        return render_perturbation(params)
+    if mode == "perturbation-noseries":
+        return render_perturbation(dict(params, series=False))
+    raise ValueError("unknown benchmark mode: {}".format(mode))
+
+# benchmark des moteurs de rendu sur le catalogue BENCH_VIEWS, sans fenêtre: chaque vue, à chaque taille et chaque
+# profondeur, est rendue par chaque moteur (perturbation seulement pour les vues profondes, pool seulement avec un
+# renderer) et la meilleure durée de repeat rendus est gardée; les modes "generic", "float32" et "smooth" mesurent
+# les noyaux d'itération (voir KERNELS), le mode "color" la coloration du buffer par la palette. Seuls les tests dont
+# l'identifiant vue/taille/nmax/mode correspond à l'expression régulière pattern sont faits
+# les "iterations" sont celles de l'algorithme simple (nmax pour les points qui l'atteignent), pour comparer les moteurs
+# sur le même travail; checksum permet de repérer les moteurs dont le résultat change
+# les résultats sont écrits en json dans le fichier path et retournés
+def run_benchmark(path, repeat=3, pattern=None, renderer=None):
+    results = []
+    print("{:48} {:>10} {:>14} {:>16}".format("benchmark", "time (s)", "pixels/s", "iterations/s"))
+    tests = ((view, size, nmax) for view in BENCH_VIEWS for size, nmax in itertools.product(BENCH_SIZES, BENCH_VIEW_NMAX.get(view[0], BENCH_NMAX)))
+    for (name, dtyp, bounds, c, power), size, nmax in tests:
+        params = make_params(dtyp, *(to_number(v) for v in bounds), nmax, *c, power=power, largeur=size, hauteur=size, interior=True)
+        if is_deep(params):
+            modes = ("perturbation", "perturbation-noseries")
+        else:
+            modes = ("scan", "generic", "float32", "smooth", "interior", "progressive", "subdiv", "tiles") + (("pool",) if renderer is not None else ())
+        buffer = None
+        for mode in modes + ("color",):
+            test = "{}/{}/{}/{}".format(name, size, nmax, mode)
+            if pattern is not None and not re.search(pattern, test):
+                continue
+            if mode == "color" and buffer is None:
+                buffer = bench_engine(params, modes[0], renderer) # buffer à colorer, si aucun moteur n'a été testé
+            best = math.inf
+            for _ in range(repeat):
+                start = time.perf_counter()
+                if mode == "color":
+                    color_buffer(buffer, build_palette(nmax, mpl.colormaps["twilight"], 2., 1.3, 1, 1, 1, (0, 0, 0)))
+                else:
+                    buffer = bench_engine(params, mode, renderer)
+                best = min(best, time.perf_counter() - start)
+            iterations = None if mode == "color" else int(np.where(buffer < 0, nmax, np.floor(buffer)).sum()) # floor: mode smooth
+            result = {"test": test, "view": name, "size": size, "nmax": nmax, "mode": mode, "time": best,
+                      "pixels_per_s": size*size / best, "iterations_per_s": None if iterations is None else iterations / best,
+                      "checksum": None if mode == "color" else hashlib.sha1(buffer.tobytes()).hexdigest()[:16]}
+            results.append(result)
+            print("{:48} {:10.4f} {:14.0f} {:>16}".format(test, best, result["pixels_per_s"],
+                  "" if iterations is None else "{:.0f}".format(result["iterations_per_s"])), flush=True)
+    report = {"meta": {"python": sys.version.split()[0], "numpy": np.__version__, "platform": sys.platform, "cpus": os.cpu_count(),
+                       "workers": renderer.workers if renderer is not None else 1, "repeat": repeat,
+                       "date": time.strftime("%Y-%m-%d %H:%M:%S")},
+              "results": results}
+    with open(path, "w") as f:
+        json.dump(report, f, indent=1)
+    return report
+
+# comparaison des résultats json new d'un benchmark avec ceux de la référence baseline: un test est signalé comme une
+# régression si sa durée augmente de plus de tolerance (relativement), comme une amélioration si elle diminue d'autant,
+# et comme changé si son checksum est différent (le moteur ne donne plus le même buffer)
+# retourne le nombre de régressions
+def compare_benchmarks(baseline, new, tolerance=0.1):
+    with open(baseline) as f:
+        base = {r["test"]: r for r in json.load(f)["results"]}
+    with open(new) as f:
+        results = json.load(f)["results"]
+    regressions = 0
+    print("{:48} {:>10} {:>10} {:>8}".format("benchmark", "base (s)", "new (s)", "ratio"))
+    for r in results:
+        b = base.get(r["test"])
+        if b is None:
+            print("{:48} {:>10} {:10.4f} {:>8}  new".format(r["test"], "", r["time"], ""))
+            continue
+        ratio = r["time"] / b["time"]
+        flags = []
+        if ratio > 1 + tolerance:
+            flags.append("REGRESSION")
+            regressions += 1
+        elif ratio < 1 - tolerance:
+            flags.append("faster")
+        if r["checksum"] != b["checksum"]:
+            flags.append("CHANGED")
+        print("{:48} {:10.4f} {:10.4f} {:8.2f}  {}".format(r["test"], b["time"], r["time"], ratio, " ".join(flags)))
+    print("{} regressions of more than {:.0f}% in {} tests".format(regressions, 100*tolerance, len(results)))
+    return regressions
 
 # programme principal
-def main(sys_args):
+# metrics_callback(metrics) est appelé avec les mesures (voir render_metrics) de chaque plot
+def main(sys_args, metrics_callback=None):
     
     # Constantes valeurs par défaut
     nmax = 100 # nombre d'itérations maximales avant de considérer que la suite diverge
@@ -40,6 +1498,29 @@ def main(sys_args):
     COLOR_EXPONENT = 1.3
     COLOR_FACTOR = 2.
     RED, GREEN, BLUE = 1, 1, 1 # multiplicateurs de couleur
+    WORKERS = 1 # nombre de processus de calcul, le rendu est parallèle par tuiles au delà de 1
+    PROGRESSIVE = True # rendu progressif, de 1/8 de la résolution à la résolution complète, annulable
+    CACHE_SIZE = 256 # mémoire maximale en Mo du cache des buffers déjà calculés
+    CACHE_DIR = None # répertoire où écrire les buffers retirés du cache, pour les relire plus tard
+    TILE_CACHE = 0 # mémoire maximale en Mo des tuiles du plan réutilisées entre les vues, 0 pour ne pas utiliser de tuiles
+    TILE_SIZE = 64 # taille en pixels des tuiles du plan
+    MODE = "scan" # mode de rendu: "scan" pour calculer tous les pixels, "subdiv" pour la subdivision par rectangles
+    DEEP = True # rendu par perturbation quand le zoom dépasse la précision des float
+    SERIES = True # approximation par série pour sauter les premières itérations du rendu par perturbation
+    PREVIEW_STEP = 4 # pixels de l'écran par point calculé dans la prévisualisation de Julia (bouton droit enfoncé)
+    LISTEN = None # source du canal de commandes json: "-" pour stdin, ou chemin d'un socket Unix; aucune sinon
+    METRICS_LOG = None # fichier où ajouter les mesures de chaque plot en json (une ligne par plot), sinon elles sont affichées
+    PROFILE = None # fichier des statistiques de cProfile des calculs (lisibles par python -m pstats), pas de profilage sinon
+    BENCH = None # fichier json des résultats du benchmark des moteurs de rendu (sans fenêtre)
+    BENCH_FILTER = None # expression régulière des tests du benchmark à faire
+    BENCH_REPEAT = 3 # nombre de rendus de chaque test du benchmark, le plus rapide est gardé
+    TOLERANCE = 0.1 # augmentation relative de durée signalée comme une régression par la comparaison des benchmarks
+    BATCH = None # fichier de commandes json (une par ligne, - pour stdin) à rendre sans fenêtre dans des fichiers
+    OUTPUT = "." # répertoire des fichiers du rendu sans fenêtre
+    FORMAT = "png" # format des fichiers du rendu sans fenêtre: png (ou bmp, tga, jpg) pour les images, npy pour les buffers, rgb pour les pixels bruts
+    INTERIOR = True # raccourcis pour l'intérieur de l'ensemble: cardioïde et disque (POWER 2), détection de périodicité
+    KERNEL = "auto" # noyau d'itération (voir KERNELS): auto choisit le plus rapide pour POWER
+    FLOAT32 = False # itérations en simple précision: plus rapides, mais seulement pour des zooms peu profonds
     #COLOR_MAP = None
     #COLOR_EXPONENT = 1
     #COLOR_FACTOR = 1
@@ -60,6 +1541,9 @@ You can zoom in the Mandelbrot or Julia set.
 To select the zoom rectangle: hold down the left mouse button, move to another point and release mouse button.
 To restore the original zoom: click the middle mouse button in the Mandelbrot or Julia set you want to restore.
 To chose the point in the Mandelbrot set for which the Julia set is draw, click the right mouse button in the Mandelbrot.
+While the right mouse button is held down and moved in the Mandelbrot set, the Julia set of the point under the mouse is previewed at low resolution.
+The plots are drawn progressively, from a coarse preview to the full resolution: a mouse click or backspace during a plot interrupts it.
+Deep zooms, beyond the precision of float numbers, are drawn by perturbation from a high precision reference orbit: their coordinates are then written as strings in the command json strings.
 
 The following keys are used:
 -m: redraw the Mandelbrot set
@@ -76,6 +1560,7 @@ The following keys are used:
 -b: increase the blue  color component for non converging part (decrease with SHIFT)
 -n: change the name of the matplotlib colormap used
 -s: toggle to keep Square aspect ration during zoom (or not)
+-k: print the statistics of the cache of already computed plots
 -backspace: redraw previous plot, read from the stack of command json strings
 
 Example colormap names:
@@ -117,6 +1602,30 @@ cmaps = [('Perceptually Uniform Sequential', [
     parser.add_argument("-G", "--Green", help="muliplicateur couleur Green")
     parser.add_argument("-B", "--Blue", help="muliplicateur couleur Blue")
     parser.add_argument("-S", "--SquareZoom", help="set to 0 not to impose square aspect ration in zoom, 1 otherwise")
+    parser.add_argument("-W", "--Workers", help="number of worker processes for the parallel tiled rendering (1 to render in the main process)")
+    parser.add_argument("-Q", "--Progressive", help="set to 0 to render in a single pass, 1 (default) for progressive coarse to fine rendering")
+    parser.add_argument("-K", "--CacheSize", help="memory limit in MB of the cache of already computed plots")
+    parser.add_argument("--CacheDir", help="directory where plots evicted from the cache are saved compressed, and read back when needed")
+    parser.add_argument("-T", "--TileCache", help="memory limit in MB of the tiles of the fractal plane reused between zooms (0, default: no tiles, render each view exactly)")
+    parser.add_argument("--TileSize", help="size in pixels of the tiles of the fractal plane")
+    parser.add_argument("-M", "--Mode", help="rendering mode: scan (default) to iterate every pixel, subdiv to fill rectangles with uniform borders and use the symmetries")
+    parser.add_argument("-I", "--Interior", help="set to 0 to always iterate up to nmax inside the set, 1 (default) to skip the main cardioid and bulb and stop periodic orbits early")
+    parser.add_argument("--Kernel", help="iteration kernel: auto (default, the fastest for the power), power2, power3, power4 (multiplications), squaring (repeated squaring, integer powers) or generic (complex power)")
+    parser.add_argument("--Float32", help="set to 1 to iterate in single precision, about twice as fast but only precise enough for shallow zooms, 0 (default) for double precision")
+    parser.add_argument("--Deep", help="set to 0 to always render with float numbers, 1 (default) to switch to high precision coordinates and perturbation rendering for deep zooms")
+    parser.add_argument("--Series", help="set to 0 to iterate every pixel from the start in perturbation rendering, 1 (default) to skip the first iterations with a series approximation")
+    parser.add_argument("--PreviewStep", help="size in pixels of the points of the low resolution Julia preview while dragging with the right button")
+    parser.add_argument("--Listen", help="read command json strings, one per line, without blocking the window: - for stdin, or the path of a Unix socket; each command gets a json reply line")
+    parser.add_argument("--MetricsLog", help="file where the json metrics of each plot are appended, one line per plot, instead of printing them")
+    parser.add_argument("--Profile", help="profile the computations with cProfile and write the statistics to this file (read them with python -m pstats)")
+    parser.add_argument("--Bench", help="run the benchmark of the render engines on a fixed catalogue of views, without window, and write the results to this json file")
+    parser.add_argument("--BenchFilter", help="regular expression selecting the benchmark tests to run, by their name view/size/nmax/mode")
+    parser.add_argument("--BenchRepeat", help="number of renders of each benchmark test, the fastest one is kept (default 3)")
+    parser.add_argument("--Compare", nargs=2, metavar=("BASELINE", "RESULTS"), help="compare two json files of benchmark results and flag the regressions")
+    parser.add_argument("--Tolerance", help="relative increase of time flagged as a regression by --Compare (default 0.1)")
+    parser.add_argument("--Batch", help="file of json command strings, one per line (- for stdin), rendered without window to files instead of the interactive plots")
+    parser.add_argument("--Output", help="directory of the files written by --Batch (default: current directory)")
+    parser.add_argument("--Format", help="format of the files written by --Batch: png (default), bmp, tga or jpg images, npy for the raw buffers of iteration counts, rgb for raw RGB pixels (one stream per animation)")
     args = parser.parse_args(sys_args)
     
 
@@ -150,6 +1659,54 @@ cmaps = [('Perceptually Uniform Sequential', [
             COLOR_MAP = None # we will use our custom color mapping
     if args.SquareZoom:
         SQUARE_ZOOM = ( int(args.SquareZoom) == 1 )
+    if args.Workers:
+        WORKERS = int(args.Workers)
+    if args.Progressive:
+        PROGRESSIVE = ( int(args.Progressive) == 1 )
+    if args.CacheSize:
+        CACHE_SIZE = float(args.CacheSize)
+    if args.CacheDir:
+        CACHE_DIR = args.CacheDir
+    if args.TileCache:
+        TILE_CACHE = float(args.TileCache)
+    if args.TileSize:
+        TILE_SIZE = int(args.TileSize)
+    if args.Mode:
+        MODE = args.Mode
+    if args.Interior:
+        INTERIOR = ( int(args.Interior) == 1 )
+    if args.Kernel:
+        if args.Kernel != "auto" and args.Kernel not in KERNELS:
+            parser.error("unknown kernel {}, choose among auto, {}".format(args.Kernel, ", ".join(KERNELS)))
+        KERNEL = args.Kernel
+    if args.Float32:
+        FLOAT32 = ( int(args.Float32) == 1 )
+    if args.PreviewStep:
+        PREVIEW_STEP = int(args.PreviewStep)
+    if args.Listen:
+        LISTEN = args.Listen
+    if args.MetricsLog:
+        METRICS_LOG = args.MetricsLog
+    if args.Profile:
+        PROFILE = args.Profile
+    if args.Bench:
+        BENCH = args.Bench
+    if args.BenchFilter:
+        BENCH_FILTER = args.BenchFilter
+    if args.BenchRepeat:
+        BENCH_REPEAT = int(args.BenchRepeat)
+    if args.Tolerance:
+        TOLERANCE = float(args.Tolerance)
+    if args.Batch:
+        BATCH = args.Batch
+    if args.Output:
+        OUTPUT = args.Output
+    if args.Format:
+        FORMAT = args.Format
+    if args.Deep:
+        DEEP = ( int(args.Deep) == 1 )
+    if args.Series:
+        SERIES = ( int(args.Series) == 1 )
         
     # autres Constantes
     if POWER == 2:
@@ -161,15 +1718,180 @@ cmaps = [('Perceptually Uniform Sequential', [
 
     # liste des commandes jstring
     jlist = []
+
+    # précision des coordonnées Decimal des zooms profonds (nombre de chiffres significatifs)
+    getcontext().prec = 100
+
+    # profilage des calculs, enregistré après chacun dans le fichier PROFILE
+    profiler = cProfile.Profile() if PROFILE is not None else None
+
+    # comparaison de résultats de benchmark, le code de sortie est 1 s'il y a des régressions
+    if args.Compare:
+        if compare_benchmarks(*args.Compare, TOLERANCE) > 0:
+            sys.exit(1)
+        return
+
+    # pool de processus pour le rendu parallèle, sinon le calcul se fait dans ce processus
+    renderer = TileRenderer(WORKERS) if WORKERS > 1 else None
+
+    # benchmark des moteurs de rendu, sans fenêtre
+    if BENCH is not None:
+        try:
+            run_benchmark(BENCH, BENCH_REPEAT, BENCH_FILTER, renderer)
+        finally:
+            if renderer is not None:
+                renderer.close()
+        return
+
+    # rendu sans fenêtre des commandes du fichier BATCH, avec les réglages de la ligne de commande
+    if BATCH is not None:
+        palettes = {}
+        def palette(nmax):
+            if nmax not in palettes:
+                palettes[nmax] = build_palette(nmax, COLOR_MAP, COLOR_FACTOR, COLOR_EXPONENT, RED, GREEN, BLUE, COLOR_CONV)
+            return palettes[nmax]
+        options = dict(power=POWER, amax=amax, largeur=LARGEUR, hauteur=HAUTEUR, interior=INTERIOR, deep=DEEP, series=SERIES, kernel=KERNEL, float32=FLOAT32)
+        lines = sys.stdin if BATCH == "-" else open(BATCH)
+        try:
+            if profiler is not None:
+                profiler.enable()
+            render_batch(lines, OUTPUT, FORMAT, palette, options, renderer.compute_many if renderer is not None else None,
+                         4*WORKERS)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(PROFILE)
+            if lines is not sys.stdin:
+                lines.close()
+            if renderer is not None:
+                renderer.close()
+        return
+
+    # cache des buffers déjà calculés: le retour en arrière (backspace) et les vues déjà visitées ne sont pas recalculés
+    cache = RenderCache(int(CACHE_SIZE*2**20), CACHE_DIR)
+    # tuiles du plan, communes à Mandelbrot et Julia, réutilisées quand une nouvelle vue recouvre les précédentes
+    tiles = RenderCache(int(TILE_CACHE*2**20)) if TILE_CACHE > 0 else None
+    # canal des commandes json reçues sans bloquer la fenêtre (touche i, et LISTEN)
+    channel = CommandChannel(LISTEN)
+    plotting = None # panneau ("m" ou "j") en cours de rendu, annulé par une nouvelle commande de plot pour ce panneau
+
+    # fonction pour savoir si un nouvel ordre de l'utilisateur (clic de souris, backspace, fermeture) doit annuler le rendu en cours
+    # les événements restent dans la file, ils seront traités par la boucle de pygame
+    def render_cancelled():
+        if pygame.event.peek(pygame.QUIT):
+            return True
+        if plotting is not None and channel.waiting(plotting):
+            return True
+        events = pygame.event.get((pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN))
+        for event in events:
+            pygame.event.post(event) # remettre les clics et les touches dans la file, dans le même ordre
+        # seuls les boutons 1 à 3 donnent un ordre: la molette (boutons 4 et 5) n'est pas traitée par la boucle
+        return any(event.button in (1, 2, 3) if event.type == pygame.MOUSEBUTTONDOWN else event.key == pygame.K_BACKSPACE for event in events)
+
+    # fonction pour calculer le buffer de nombres d'itérations d'une image, en parallèle si possible, avec l'état des
+    # orbites arrêtées par nmax (None si le mode de rendu ne le donne pas)
+    # en mode progressif, chaque passe est affichée à partir de la colonne x0 de l'écran, et le calcul est abandonné
+    # (retourne None) dès qu'un nouvel ordre de l'utilisateur arrive; les mesures du calcul sont ajoutées à stats
+    def compute(params, x0, stats):
+        shape = (params["hauteur"], params["largeur"])
+        if is_deep(params): # perturbation, par passes (une seule sans PROGRESSIVE) et par bandes, annulable entre elles
+            reference = perturbation_reference(params, stats)
+            buffer = np.empty(shape, dtype=np.int32)
+            passes = PASSES if PROGRESSIVE else (1,)
+            for step in passes:
+                for _ in render_pass(params, buffer, step, step == passes[0], stats=stats, reference=reference):
+                    if render_cancelled():
+                        return None
+                if step > 1:
+                    show_buffer(upscale(buffer, step), x0, params["nmax"])
+                    pygame.display.flip()
+            print("Perturbation: {} iterations skipped by the series, {} rebases".format(stats["series_skip"], stats["rebases"]))
+            return buffer, None
+        if tiles is not None:
+            buffer = render_from_tiles(params, tiles, TILE_SIZE, renderer.compute_many if renderer is not None else None, render_cancelled, stats)
+            return None if buffer is None else (buffer, None)
+        if MODE == "subdiv":
+            buffer, orbit = render_subdivide(params, stats, renderer)
+            print("Pixels iterated: {} of {} ({:.1f}%)".format(stats["iterated"], buffer.size, 100*stats["iterated"]/buffer.size))
+            return buffer, orbit
+        if not PROGRESSIVE:
+            if renderer is not None:
+                return renderer.compute(params, stats)
+            orbit = np.empty(shape + (2,), dtype=complex)
+            return compute_escape(params, orbit, stats), orbit
+        if renderer is not None:
+            buffer, orbit = renderer.buffer(shape), renderer.orbit()
+        else:
+            buffer, orbit = np.empty(shape, dtype=np.int32), np.empty(shape + (2,), dtype=complex)
+        for step in PASSES:
+            first = ( step == PASSES[0] )
+            blocks = renderer.render_pass(params, step, first) if renderer is not None else render_pass(params, buffer, step, first, orbit, stats)
+            for tile_stats in blocks:
+                if tile_stats is not None: # mesures d'une tuile calculée par le pool
+                    add_stats(stats, **tile_stats)
+                if render_cancelled():
+                    if renderer is not None:
+                        renderer.cancel()
+                    return None
+            if step > 1: # afficher l'aperçu de cette passe, la dernière est affichée par le plot
+                show_buffer(upscale(buffer, step), x0, params["nmax"])
+                pygame.display.flip()
+        if renderer is not None:
+            return buffer.copy(), orbit.copy()
+        return buffer, orbit
+
+    # fonction pour obtenir le buffer de params: depuis le cache, depuis deep, le rendu le plus profond de la même vue
+    # (params, buffer, orbit), en continuant seulement les orbites arrêtées par son nmax, ou par un nouveau calcul
+    # retourne le buffer (None si le calcul a été annulé) et le nouveau rendu le plus profond
+    # stats reçoit l'origine du buffer (source) et les mesures du calcul; avec PROFILE, le calcul est profilé
+    def render(params, x0, deep, stats):
+        buffer = cache.get(params)
+        stats["source"] = "cache" if buffer is not None else "compute"
+        if buffer is not None:
+            if deep is None or not same_view(deep[0], params) or params["nmax"] > deep[0]["nmax"]:
+                deep = (params, buffer, None)
+            return buffer, deep
+        if tiles is None and deep is not None and same_view(deep[0], params) and not is_deep(params):
+            stats["source"] = "deepen"
+            buffer, orbit = deepen(params, deep[1], deep[2], deep[0]["nmax"], stats)
+            if params["nmax"] > deep[0]["nmax"]:
+                deep = (params, buffer, orbit)
+            cache.put(params, buffer)
+            return buffer, deep
+        if profiler is not None:
+            profiler.enable()
+        try:
+            result = compute(params, x0, stats)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(PROFILE)
+        if result is None:
+            return None, deep
+        cache.put(params, result[0])
+        return result[0], (params,) + result
+
+    # derniers buffers de nombres d'itérations de chaque côté de l'écran, avec les paramètres qui ont servi à les calculer
+    # les changements de couleur recolorent ces buffers sans recalculer les fractales
+    m_params, m_buffer = None, None
+    j_params, j_buffer = None, None
+    # rendu le plus profond (params, buffer, état des orbites) de la vue de chaque côté: quand seul nmax change,
+    # les nombres d'itérations déjà connus sont réutilisés au lieu de tout recalculer
+    m_deep, j_deep = None, None
     
     # Initialisation de pygame et création d'une fenêtre aux dimensions spécifiéés (LARGEUR et HAUTEUR sont celles du côté gauche de l'écran pour Mandelbrot)
     pygame.init()
     screen = pygame.display.set_mode((2*LARGEUR,HAUTEUR)) # 2*LARGEUR pour avoir le coté droit de l'écran pour Julia
 
-    # fonction pour retourner les composantes RGB d'une couleur n dans une colormap cmap de matplotlib
-    def getColorRGB(n, cmap):
-        color = cmap.colors[int(n) % len(cmap.colors)] # map n into the length of the colormap (usually len = 256)
-        return int(color[0]*255), int(color[1]*255), int(color[2]*255) # inde 0,1,2=R,G,B, multiply value (between 0 and 1) by 255 for real RGB value
+    # table des couleurs (palette) pour les réglages de couleur courants, recalculée seulement quand un réglage change
+    palette_cache = {}
+    def get_palette(nmax):
+        key = (nmax, COLOR_MAP.name if COLOR_MAP is not None else None, COLOR_FACTOR, COLOR_EXPONENT, RED, GREEN, BLUE, COLOR_CONV)
+        if key not in palette_cache:
+            if len(palette_cache) > 8:
+                palette_cache.clear() # peu de palettes utiles à la fois (une par nmax des buffers affichés)
+            palette_cache[key] = build_palette(nmax, COLOR_MAP, COLOR_FACTOR, COLOR_EXPONENT, RED, GREEN, BLUE, COLOR_CONV)
+        return palette_cache[key]
 
     # fonction pour convertir la position sur l'écran en coordonnée dans le repère défini par xmin:xmax et ymin:ymax
     def getPosFromScr(XSCR, YSCR, xmin, xmax, ymin, ymax):
@@ -177,6 +1899,15 @@ cmaps = [('Perceptually Uniform Sequential', [
         y = (YSCR * (ymin - ymax) / HAUTEUR + ymax)
         return x,y
 
+    # fonction pour passer les bornes en Decimal quand la vue devient trop petite pour les float (ou quand l'une
+    # d'elles est déjà un Decimal), les coordonnées suivantes sont alors calculées en haute précision
+    def precise(xmin, xmax, ymin, ymax):
+        bounds = (xmin, xmax, ymin, ymax)
+        if any(isinstance(v, Decimal) for v in bounds) or (DEEP and min(xmax - xmin, ymax - ymin) <
+                1000*DEEP_LIMIT*max(1, abs(xmin), abs(xmax), abs(ymin), abs(ymax))):
+            return tuple(to_decimal(v) for v in bounds)
+        return bounds
+
     # convert positions of corners to min max of zoom box
     def getMinMaxFromPos(px0,px1,py0,py1):
         if SQUARE_ZOOM:
@@ -192,64 +1923,73 @@ cmaps = [('Perceptually Uniform Sequential', [
             xmax = max(px0,px1)
             ymin = min(py0,py1)
             ymax = max(py0,py1)
-        return xmin,xmax,ymin,ymax
-
-    # itérations dans la suite de nombres complexes: z(n+1) = z(n)**2 + c
-    def iterate(xn,yn,cx,cy,nmax):
-        n = 0
-        z = complex(xn,yn)
-        c = complex(cx,cy)
-        while abs(z) < amax and n < nmax:
-            z = z**POWER + c
-            n += 1
-        #while (xn * xn + yn * yn) < 4 and n < nmax: # on teste que le carré de la norme du nombre complex zn est inférieur à 4 -> permet d'économiser un calcul de racine carrée coûteux en terme de performances
-        #    xn,     yn     =     xn * xn - yn * yn + cx,     2 * xn * yn + cy
-        #    n += 1
-        if n == nmax:
-            return -1
-        else:
-            return n
-    
-    # fonction donnant la couleur pour le nombre d'itérations n
-    def color_of_iteration(n):
-        n_scaled = COLOR_FACTOR*n**COLOR_EXPONENT
-        if COLOR_MAP == None:
-            #return ((RED * n) % 256, (GREEN * n) % 256, (BLUE * n) % 256)
-            #return ((RED * math.sqrt(n)) % 256, (GREEN * math.sqrt(n)) % 256, (BLUE * math.sqrt(n)) % 256)
-            #return ((RED * math.log(n)) % 256, (GREEN * math.log(n)) % 256, (BLUE * math.log(n)) % 256)
-            #return ((RED * n**2) % 256, (GREEN * n**2) % 256, (BLUE * n**2) % 256)
-            #return ((RED * n*math.log(n)) % 256, (GREEN * n*math.log(n)) % 256, (BLUE * n*math.log(n)) % 256)
-            return ((RED * n_scaled) % 256, (GREEN * n_scaled) % 256, (BLUE * n_scaled) % 256)
+        return precise(xmin,xmax,ymin,ymax)
+
+    # fonction pour afficher un buffer de nombres d'itérations à partir de la colonne x0 de l'écran (0 ou LARGEUR)
+    # toute l'image est colorée en une passe par la palette, puis copiée sur l'écran en un seul blit
+    # les durées de la coloration et de l'affichage sont ajoutées à stats
+    def show_buffer(buffer, x0, nmax, stats=None):
+        start = time.perf_counter()
+        rgb = get_palette(nmax)[buffer] # l'indice -1 (nmax atteint) donne la dernière couleur de la palette: COLOR_CONV
+        colored = time.perf_counter()
+        screen.blit(pygame.surfarray.make_surface(rgb.swapaxes(0, 1)), (x0, 0)) # surfarray est indexé [x, y]
+        add_stats(stats, coloring=colored - start, blit=time.perf_counter() - colored)
+
+    # fonction pour publier les mesures d'un plot de params commencé à start: dans le fichier METRICS_LOG ou sur la
+    # console (une ligne json), et à metrics_callback; retourne les mesures et leur résumé pour le titre de la fenêtre
+    def report_metrics(params, buffer, stats, start):
+        metrics = render_metrics(params, buffer, stats, time.perf_counter() - start)
+        for name, c in (("cache", cache), ("tile_cache", tiles)):
+            if c is not None:
+                cstats = c.stats()
+                lookups = cstats["hits"] + cstats["disk_hits"] + cstats["misses"]
+                metrics[name] = dict(cstats, hit_rate=(cstats["hits"] + cstats["disk_hits"]) / lookups if lookups else 0)
+        line = json.dumps({"Metrics": metrics})
+        if METRICS_LOG is not None:
+            with open(METRICS_LOG, "a") as f:
+                f.write(line + "\n")
         else:
-            color = getColorRGB(n_scaled,COLOR_MAP) # apply exponent for changing color depth
-            return ((RED * color[0]) % 256, (GREEN * color[1]) % 256, (BLUE * color[2]) % 256)
-            #return color
-            
+            print(line)
+        if metrics_callback is not None:
+            metrics_callback(metrics)
+        return metrics, "{:.2f} s, {:.1f} M iterations, {:.0f}% escaped, cache {:.0f}%".format(
+            metrics["total"], metrics.get("iterations", 0) / 1e6, 100*metrics["escaped"] / buffer.size, 100*metrics["cache"]["hit_rate"])
+
     # fonction pour dessiner l'ensemble de Mandelbrot
     def plot_Mandelbrot(xmin,xmax,ymin,ymax,nmax):
         # Création de l'ensemble de Mandelbrot
         # Principe : on balaye l'écran pixel par pixel en convertissant le pixel en un point du plan de notre repère
         # Si la suite converge, le point appartient à l'ensemble de Mandelbrot et on colore le pixel en noir
         # Sinon la suite diverge, le point n'appartient pas à l'ensemble et on colore le pixel en couleur
-        jstring = '{ ' + '"Dtyp": "PlotMandel", "xmin": {}, "xmax": {}, "ymin": {}, "ymax": {}, "nmax": {}'.format(xmin,xmax,ymin,ymax,nmax) + ' }'
+        jstring = '{ ' + '"Dtyp": "PlotMandel", "xmin": {}, "xmax": {}, "ymin": {}, "ymax": {}, "nmax": {}'.format(*map(json_number, (xmin,xmax,ymin,ymax)),nmax) + ' }'
         jlist.append(jstring)
         print(jstring)
-        for YSCR in range(HAUTEUR):
-            for XSCR in range(LARGEUR):
-                # Associer à chaque pixel de l'écran de coordonnées (XSCR;YSCR)
-                # un point C du plan de coordonnées (cx;cy) dans le repère défini par xmin:xmax et ymin:ymax
-                cx, cy = getPosFromScr(XSCR, YSCR, xmin, xmax, ymin, ymax)
-                # valeur initiale de la suite de nombres complexes de Mandelbrot
-                xn, yn = 0, 0
-                n = iterate(xn,yn,cx,cy,nmax)
-                if n < 0:
-                    screen.set_at((XSCR, YSCR), COLOR_CONV) # On colore le pixel en noir -> code RGB : (0,0,0)
-                else:
-                    screen.set_at((XSCR, YSCR), color_of_iteration(n))
-                    #screen.set_at((XSCR, YSCR), (255, 255, 255)) # On colore le pixel en blanc -> code RGB : (255,255,255)
+        # Associer à chaque pixel de l'écran de coordonnées (XSCR;YSCR)
+        # un point C du plan de coordonnées (cx;cy) dans le repère défini par xmin:xmax et ymin:ymax,
+        # avec la valeur initiale 0 de la suite: tous les pixels sont itérés ensemble par le moteur numpy
+        # le calcul n'est refait que si le repère, nmax, POWER ou amax ont changé depuis le dernier buffer
+        nonlocal m_params, m_buffer, m_deep, plotting
+        params = make_params("PlotMandel",xmin,xmax,ymin,ymax,nmax,power=POWER,amax=amax,largeur=LARGEUR,hauteur=HAUTEUR,interior=INTERIOR,deep=DEEP,series=SERIES,kernel=KERNEL,float32=FLOAT32)
+        start, stats = time.perf_counter(), {"source": "screen"} # sans calcul, le buffer affiché est réutilisé
+        if params != m_params:
+            m_params, m_buffer = None, None
+            plotting = "m"
+            try:
+                buffer, m_deep = render(params, 0, m_deep, stats)
+            finally: # même si le rendu échoue, les commandes pour ce panneau n'annulent plus les autres rendus
+                plotting = None
+            if buffer is None:
+                print("Cancelled.")
+                return None
+            m_params, m_buffer = params, buffer
+        show_buffer(m_buffer, 0, nmax, stats)
+        flip = time.perf_counter()
         pygame.display.flip() # Mise à jour et rafraîchissement de la fenêtre graphique pour affichage
-        pygame.display.set_caption("Mandelbrot plot=({};{};{};{}) nmax={}".format(m_xmin,m_xmax,m_ymin,m_ymax,nmax))
+        add_stats(stats, blit=time.perf_counter() - flip)
+        metrics, summary = report_metrics(params, m_buffer, stats, start)
+        pygame.display.set_caption("Mandelbrot plot=({};{};{};{}) nmax={}".format(m_xmin,m_xmax,m_ymin,m_ymax,nmax) + " - " + summary)
         print("Ready.")
+        return metrics
 
     # fonction pour dessiner l'ensemble de Julia
     def plot_Julia(xmin,xmax,ymin,ymax,nmax,cx=0.285,cy=0.01):
@@ -257,44 +1997,128 @@ cmaps = [('Perceptually Uniform Sequential', [
         # Principe : on balaye l'écran pixel par pixel en convertissant le pixel en un point du plan de notre repère
         # Si la suite converge, le point appartient à l'ensemble de Julia et on colore le pixel en noir
         # Sinon la suite diverge, le point n'appartient pas à l'ensemble et on colore le pixel en couleur
-        jstring = '{ ' + '"Dtyp": "PlotJulia", "xmin": {}, "xmax": {}, "ymin": {}, "ymax": {}, "nmax": {}, "cx": {}, "cy": {} '.format(xmin,xmax,ymin,ymax,nmax,cx,cy) + ' }'
+        jstring = '{ ' + '"Dtyp": "PlotJulia", "xmin": {}, "xmax": {}, "ymin": {}, "ymax": {}, "nmax": {}, "cx": {}, "cy": {} '.format(*map(json_number, (xmin,xmax,ymin,ymax)),nmax,json_number(cx),json_number(cy)) + ' }'
         print(jstring)
         jlist.append(jstring)
-        for YSCR in range(HAUTEUR):
-            for XSCR in range(LARGEUR):
-                # Associer à chaque pixel de l'écran de coordonnées (XSCR;YSCR)
-                # un point de coordonnées (xn;yn) dans le repère défini par xmin:xmax et ymin:ymax
-                # avec la constante d'origine de Julia (cx;cy), relevé dans le plan de Mandelbrot
-                xn, yn = getPosFromScr(XSCR, YSCR, xmin, xmax, ymin, ymax)
-                n = iterate(xn,yn,cx,cy,nmax)
-                if n < 0:
-                    # +LARGEUR pour dessiner sur le côté droit de l'écran
-                    screen.set_at((XSCR+LARGEUR, YSCR), COLOR_CONV) # On colore le pixel en noir -> code RGB : (0,0,0)
-                else:
-                    # +LARGEUR pour dessiner sur le côté droit de l'écran
-                    screen.set_at((XSCR+LARGEUR, YSCR), color_of_iteration(n))
-                    #screen.set_at((XSCR+LARGEUR, YSCR), (255, 255, 255)) # On colore le pixel en blanc -> code RGB : (255,255,255)
+        # Associer à chaque pixel de l'écran de coordonnées (XSCR;YSCR)
+        # un point de coordonnées (xn;yn) dans le repère défini par xmin:xmax et ymin:ymax
+        # avec la constante d'origine de Julia (cx;cy), relevé dans le plan de Mandelbrot
+        # le calcul n'est refait que si le repère, nmax, POWER, amax ou la constante c ont changé depuis le dernier buffer
+        nonlocal j_params, j_buffer, j_deep, plotting
+        params = make_params("PlotJulia",xmin,xmax,ymin,ymax,nmax,cx,cy,power=POWER,amax=amax,largeur=LARGEUR,hauteur=HAUTEUR,interior=INTERIOR,deep=DEEP,series=SERIES,kernel=KERNEL,float32=FLOAT32)
+        start, stats = time.perf_counter(), {"source": "screen"} # sans calcul, le buffer affiché est réutilisé
+        if params != j_params:
+            j_params, j_buffer = None, None
+            plotting = "j"
+            try:
+                buffer, j_deep = render(params, LARGEUR, j_deep, stats)
+            finally: # même si le rendu échoue, les commandes pour ce panneau n'annulent plus les autres rendus
+                plotting = None
+            if buffer is None:
+                print("Cancelled.")
+                return None
+            j_params, j_buffer = params, buffer
+        show_buffer(j_buffer, LARGEUR, nmax, stats) # +LARGEUR pour dessiner sur le côté droit de l'écran
+        flip = time.perf_counter()
         pygame.display.flip() # Mise à jour et rafraîchissement de la fenêtre graphique pour affichage
-        pygame.display.set_caption("Julia plot=({};{};{};{}) c=({};{}) nmax={}".format(m_xmin,m_xmax,m_ymin,m_ymax,j_cx,j_cy,nmax))
+        add_stats(stats, blit=time.perf_counter() - flip)
+        metrics, summary = report_metrics(params, j_buffer, stats, start)
+        pygame.display.set_caption("Julia plot=({};{};{};{}) c=({};{}) nmax={}".format(m_xmin,m_xmax,m_ymin,m_ymax,j_cx,j_cy,nmax) + " - " + summary)
         print("Ready.")
+        return metrics
+
+    # fonction pour rendre un poster (commande json "PosterMandel" ou "PosterJulia") dans le répertoire OUTPUT/"File",
+    # en affichant son aperçu au fur et à mesure du côté de l'écran de l'ensemble; un poster annulé (clic de souris,
+    # backspace) reprend là où il s'était arrêté quand la même commande est relancée
+    def plot_poster(jdict):
+        x0 = 0 if jdict["Dtyp"] == "PosterMandel" else LARGEUR
+        params = command_params(dict(jdict, Dtyp=jdict["Dtyp"].replace("Poster", "Plot")), power=POWER, amax=amax, largeur=LARGEUR,
+                                hauteur=HAUTEUR, interior=INTERIOR, deep=DEEP, series=SERIES, kernel=KERNEL, float32=FLOAT32)
+        directory = os.path.join(OUTPUT, jdict.get("File", "poster"))
+        screen.fill(COLOR_CONV, (x0, 0, LARGEUR, HAUTEUR))
+        def progress(preview, done, total):
+            show_buffer(preview, x0, params["nmax"])
+            pygame.display.flip()
+            pygame.display.set_caption("Poster {}: {} of {} tiles".format(directory, done, total))
+        preview = render_poster(params, directory, get_palette(params["nmax"]), jdict.get("tile", POSTER_TILE), (LARGEUR, HAUTEUR),
+                                renderer.compute_many if renderer is not None else None, 4*WORKERS, progress, render_cancelled)
+        if preview is None:
+            print("Cancelled, run the same command again to resume the poster.")
+            return None
+        print("Written:", os.path.join(directory, "poster.png"))
+        return os.path.join(directory, "poster.png")
+
+    # fonction pour prévisualiser l'ensemble de Julia de constante (cx;cy) en basse résolution (un point calculé pour
+    # PREVIEW_STEP x PREVIEW_STEP pixels de l'écran), assez vite pour suivre la souris
+    def preview_Julia(cx, cy):
+        largeur, hauteur = -(-LARGEUR // PREVIEW_STEP), -(-HAUTEUR // PREVIEW_STEP)
+        params = make_params("PlotJulia", j_xmin, j_xmin + (j_xmax - j_xmin)*largeur*PREVIEW_STEP/LARGEUR, j_ymax - (j_ymax - j_ymin)*hauteur*PREVIEW_STEP/HAUTEUR,
+                             j_ymax, nmax, cx, cy, power=POWER, amax=amax, largeur=largeur, hauteur=hauteur, interior=INTERIOR, deep=DEEP, series=SERIES, kernel=KERNEL, float32=FLOAT32)
+        buffer = np.repeat(np.repeat(render_view(params), PREVIEW_STEP, axis=0), PREVIEW_STEP, axis=1)
+        show_buffer(buffer[:HAUTEUR, :LARGEUR], LARGEUR, nmax)
+        pygame.display.flip()
+        pygame.display.set_caption("Julia preview c=({};{}) nmax={}".format(cx, cy, nmax))
+
+    # fonction pour recolorer et réafficher les deux ensembles à partir des derniers buffers, sans itérer
+    def recolor():
+        if m_buffer is not None:
+            show_buffer(m_buffer, 0, m_params["nmax"])
+        if j_buffer is not None:
+            show_buffer(j_buffer, LARGEUR, j_params["nmax"])
+        pygame.display.flip()
+
+    # fonction pour changer la palette par le nom d'une colormap de matplotlib (touche n)
+    def set_colormap(cstring):
+        nonlocal COLOR_MAP
+        try:
+            COLOR_MAP = mpl.colormaps[cstring] # we will use matplotlib colormap
+        except:
+            COLOR_MAP = None # we will use our custom color mapping
+        recolor()
 
     # fonction pour dessiner l'ensemble de Mandelbrot ou de Julia, selon ce qu'il ya dans le string json
+    # retourne le statut de la commande (done, cancelled, error ou ignored) avec les mesures du plot, pour la réponse
+    # du canal de commandes
     def execute_json_command(jstring):
         import json
         # define variables nonlocal, to use those known outside of this nested function (we could avoid this by making a class)
         nonlocal m_xmin,m_xmax,m_ymin,m_ymax,nmax 
         nonlocal j_xmin,j_xmax,j_ymin,j_ymax,nmax,j_cx,j_cy 
+        nonlocal KERNEL,FLOAT32
         try: # en cas de string qui ne se décode pas avec la prochaine ligne, l'exception JSONDecodeError est produite
             jdict = json.loads(jstring) # decoder le string jstring (supposé en format json) vers le dictionaire jdict
+            # valider toute la commande avant de changer la vue: une valeur invalide ne doit pas rester dans nmax ou les bornes
+            command_params(dict(jdict, Dtyp=jdict["Dtyp"].replace("Poster", "Plot")) if "Dtyp" in jdict else jdict, power=POWER, amax=amax,
+                           largeur=LARGEUR, hauteur=HAUTEUR)
+            if jdict.get("Dtyp") == "PlotJulia" and not ("cx" in jdict and "cy" in jdict):
+                raise KeyError("cx" if "cx" not in jdict else "cy")
+            if "kernel" in jdict: # noyau d'itération, gardé pour les plots suivants
+                if jdict["kernel"] != "auto" and jdict["kernel"] not in KERNELS:
+                    raise ValueError("unknown kernel {}".format(jdict["kernel"]))
+                KERNEL = jdict["kernel"]
+            if "float32" in jdict:
+                FLOAT32 = bool(jdict["float32"])
             if "Dtyp" in jdict:
                 if jdict["Dtyp"] == "PlotMandel":
-                    m_xmin,m_xmax,m_ymin,m_ymax,nmax = jdict["xmin"],jdict["xmax"],jdict["ymin"],jdict["ymax"],jdict["nmax"]
-                    plot_Mandelbrot(m_xmin,m_xmax,m_ymin,m_ymax,nmax)
+                    m_xmin,m_xmax,m_ymin,m_ymax = precise(*(to_number(jdict[k]) for k in ("xmin","xmax","ymin","ymax"))) # coordonnées haute précision en string
+                    nmax = jdict["nmax"]
+                    metrics = plot_Mandelbrot(m_xmin,m_xmax,m_ymin,m_ymax,nmax)
+                    return {"status": "done", "metrics": metrics} if metrics is not None else {"status": "cancelled"}
+                elif jdict["Dtyp"] in ("PosterMandel", "PosterJulia"):
+                    path = plot_poster(jdict)
+                    return {"status": "done", "File": path} if path is not None else {"status": "cancelled"}
                 elif jdict["Dtyp"] == "PlotJulia":
-                    j_xmin,j_xmax,j_ymin,j_ymax,nmax,j_cx,j_cy = jdict["xmin"],jdict["xmax"],jdict["ymin"],jdict["ymax"],jdict["nmax"],jdict["cx"],jdict["cy"]
-                    plot_Julia(j_xmin,j_xmax,j_ymin,j_ymax,nmax,j_cx,j_cy)
+                    j_xmin,j_xmax,j_ymin,j_ymax = precise(*(to_number(jdict[k]) for k in ("xmin","xmax","ymin","ymax"))) # coordonnées haute précision en string
+                    nmax,j_cx,j_cy = jdict["nmax"],to_number(jdict["cx"]),to_number(jdict["cy"])
+                    metrics = plot_Julia(j_xmin,j_xmax,j_ymin,j_ymax,nmax,j_cx,j_cy)
+                    return {"status": "done", "metrics": metrics} if metrics is not None else {"status": "cancelled"}
+            return {"status": "ignored"}
         except json.decoder.JSONDecodeError: # dans le cas de cette exception, simplemnt faire ce print, au lieu de planter le programme
             print("Error decoding json string: ", jstring)
+            return {"status": "error", "error": "invalid json"}
+        except (KeyError, TypeError, ValueError, AttributeError, ArithmeticError) as e: # commande incomplète ou valeur invalide
+            print("Error in json command: ", jstring, repr(e))
+            return {"status": "error", "error": repr(e)}
 
     # dessiner Mandelbrot et Julia une 1ère fois
     plot_Mandelbrot(m_xmin,m_xmax,m_ymin,m_ymax,nmax)
@@ -302,7 +2126,9 @@ cmaps = [('Perceptually Uniform Sequential', [
 
     # Boucle infinie de pygame, permettant de raffraichir la fenêtre graphique et d'interagir, de zoomer, etc
     loop = True
+    j_drag = False # bouton droit enfoncé depuis Mandelbrot: prévisualisation de Julia
     while loop:
+        preview_c = (j_cx, j_cy)
         for event in pygame.event.get():
             if event.type == pygame.QUIT: # Pour quitter l'application en fermant la fenêtre
                 loop = False
@@ -338,14 +2164,26 @@ cmaps = [('Perceptually Uniform Sequential', [
 
                 if event.button == 3: # right button down
                     # relever un point cx,cy dans l'ensemble de Mandelbrot pour dessiner Julia avec cette graine
+                    # tant que le bouton reste enfoncé, Julia est prévisualisé en basse résolution en suivant la souris
+                    PSCR = pygame.mouse.get_pos()
+                    if PSCR[0] < LARGEUR:
+                        j_cx, j_cy = getPosFromScr(PSCR[0], PSCR[1], m_xmin, m_xmax, m_ymin, m_ymax)
+                        j_drag = True
+
+            elif event.type == pygame.MOUSEMOTION:
+                if event.buttons[2] and j_drag: # déplacement avec le bouton droit enfoncé depuis Mandelbrot
                     PSCR = pygame.mouse.get_pos()
-                    j_cx, j_cy = getPosFromScr(PSCR[0], PSCR[1], m_xmin, m_xmax, m_ymin, m_ymax)
+                    if PSCR[0] < LARGEUR:
+                        j_cx, j_cy = getPosFromScr(PSCR[0], PSCR[1], m_xmin, m_xmax, m_ymin, m_ymax)
+
+            elif event.type == pygame.MOUSEBUTTONUP:
+                if event.button == 3 and j_drag: # right button up
+                    # redessiner Julia en pleine résolution avec le dernier point comme valeur initiale
+                    j_drag = False
                     print("j_c=({};{})".format(j_cx,j_cy))
-                    # redissiner Julia avec ce point comme valeur initiale
                     print("Redraw Julia with nmax=",nmax)
                     plot_Julia(j_xmin, j_xmax, j_ymin, j_ymax,nmax,j_cx,j_cy)
 
-            elif event.type == pygame.MOUSEBUTTONUP:
                 if event.button == 1: # left button up
                     # relever le 2ème point px1,py1 dans l'ensemble de Mandelbrot
                     PSCR = pygame.mouse.get_pos()
@@ -413,61 +2251,72 @@ cmaps = [('Perceptually Uniform Sequential', [
                 elif event.key == pygame.K_r and pygame.key.get_mods() & pygame.KMOD_SHIFT:
                     RED = max(0,RED-1)
                     print("Color decreased to RED=",RED)
+                    recolor()
 
                 # checking if key "r" was pressed
                 elif event.key == pygame.K_r:
                     RED += 1
                     print("Color increased to RED=",RED)
+                    recolor()
 
                 # checking if key "SHIFT + g" was pressed
                 elif event.key == pygame.K_g and pygame.key.get_mods() & pygame.KMOD_SHIFT:
                     GREEN = max(0,GREEN-1)
                     print("Color decreased to GREEN=",GREEN)
+                    recolor()
 
                 # checking if key "g" was pressed
                 elif event.key == pygame.K_g:
                     GREEN += 1
                     print("Color increased to GREEN=",GREEN)
+                    recolor()
 
                 # checking if key "SHIFT + b" was pressed
                 elif event.key == pygame.K_b and pygame.key.get_mods() & pygame.KMOD_SHIFT:
                     BLUE = max(0,BLUE-1)
                     print("Color decreased to BLUE=",BLUE)
+                    recolor()
 
                 # checking if key "b" was pressed
                 elif event.key == pygame.K_b:
                     BLUE += 1
                     print("Color increased to BLUE=",BLUE)
+                    recolor()
 
                 # checking if key "SHIFT + e" was pressed
                 elif event.key == pygame.K_e and pygame.key.get_mods() & pygame.KMOD_SHIFT:
                     COLOR_EXPONENT = max(0.05,COLOR_EXPONENT-0.05)
                     print("ColorExponent decreased to ",COLOR_EXPONENT)
+                    recolor()
 
                 # checking if key "e" was pressed
                 elif event.key == pygame.K_e:
                     COLOR_EXPONENT += 0.05
                     print("ColorExponent indecreased to ",COLOR_EXPONENT)
+                    recolor()
 
                 # checking if key "SHIFT + f" was pressed
                 elif event.key == pygame.K_f and pygame.key.get_mods() & pygame.KMOD_SHIFT:
                     COLOR_FACTOR = max(0.05,COLOR_FACTOR-0.05)
                     print("ColorFactor decreased to ",COLOR_FACTOR)
+                    recolor()
 
                 # checking if key "f" was pressed
                 elif event.key == pygame.K_f:
                     COLOR_FACTOR += 0.05
                     print("ColorFactor indecreased to ",COLOR_FACTOR)
+                    recolor()
 
                 # checking if key "c" was pressed
                 elif event.key == pygame.K_c:
                     COLOR_CONV = (255-COLOR_CONV[0], 255-COLOR_CONV[1], 255-COLOR_CONV[2]) 
                     print("Color for converging part inverted")
+                    recolor()
 
                 # checking if key "i" was pressed
                 elif event.key == pygame.K_i:
-                    jstring=input("Enter command json string:\n") # entrer un string sur la console
-                    execute_json_command(jstring) # appeler la fonction execute_json_command avec ce string
+                    # le string est lu sur la console par un thread, la fenêtre reste active; il est exécuté par la boucle
+                    channel.prompt("Enter command json string:\n")
 
                 # checking if key "backspace" was pressed
                 elif event.key == pygame.K_BACKSPACE:
@@ -480,19 +2329,40 @@ cmaps = [('Perceptually Uniform Sequential', [
 
                 # checking if key "n" was pressed
                 elif event.key == pygame.K_n:
-                    cstring=input("Enter name of matplotlib colormap string:\n") # entrer un string sur la console
-                    try:
-                        COLOR_MAP = mpl.colormaps[cstring] # we will use matplotlib colormap
-                    except:
-                        COLOR_MAP = None # we will use our custom color mapping
+                    # le nom est lu sur la console par un thread, comme pour la touche i; set_colormap est appelée par la boucle
+                    channel.prompt("Enter name of matplotlib colormap string:\n", set_colormap)
+
+                # checking if key "k" was pressed
+                elif event.key == pygame.K_k:
+                    print("Cache statistics:", cache.stats())
+                    if tiles is not None:
+                        print("Tile cache statistics:", tiles.stats())
 
                 # checking if key "s" was pressed
                 elif event.key == pygame.K_s:
                     SQUARE_ZOOM = not SQUARE_ZOOM
                     print("SquareZoom set to ",SQUARE_ZOOM)
+
+        # prévisualiser Julia pour le dernier point relevé pendant le déplacement avec le bouton droit
+        if j_drag and (j_cx, j_cy) != preview_c:
+            preview_Julia(j_cx, j_cy)
+
+        # appliquer les réponses lues sur la console (touche n)
+        for action, answer in channel.answered():
+            action(answer)
+
+        # exécuter les commandes reçues par le canal (seule la dernière vue de chaque panneau), avec leur réponse
+        for jstring, reply, received in channel.drain():
+            start = time.perf_counter()
+            result = execute_json_command(jstring)
+            channel.respond(reply, jstring, received, queued=start - received, **result)
                     
-    # terminer pygame
+    # terminer pygame, le cache et le pool de processus
     pygame.quit()
+    channel.close()
+    cache.close()
+    if renderer is not None:
+        renderer.close()
 
 # appel du programme principal avec les arguments de la ligne de commande
 if __name__ == "__main__":